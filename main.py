@@ -20,29 +20,44 @@ def cmd_ingest(_args=None):
     ingest_main()
 
 
-def build_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(
-        prog="ia_rag",
-        description="Executa processos do pipeline (ingestão, etc.)",
+def cmd_search(args):
+    from src.search import run_search
+
+    return run_search(
+        mode=args.mode,
+        query=args.query,
+        size=args.size,
+        limit=args.limit,
+        explain=not args.no_explain,
     )
-    sub = parser.add_subparsers(dest="command")
 
+
+def cmd_ask(args):
+    from src.rag import run_rag
+
+    answer = run_rag(
+        query=args.query,
+        topk=args.topk,
+        provider=args.provider,
+        model_name=args.model,
+        temperature=args.temperature,
+        max_tokens=args.max_tokens,
+        use_hybrid=not args.no_hybrid,
+        filter_law=args.filter_law,
+        debug_print=args.debug,
+    )
+    # Imprime a resposta final do LLM
+    print(answer)
+
+
+def _add_ingest(sub):
     # Subcomando: ingest
     p_ingest = sub.add_parser("ingest", help="Executa a ingestão e indexação completa")
     p_ingest.set_defaults(func=cmd_ingest)
 
-    # Subcomando: search
-    def cmd_search(args):
-        from src.search import run_search
-
-        return run_search(
-            mode=args.mode,
-            query=args.query,
-            size=args.size,
-            limit=args.limit,
-            explain=not args.no_explain,
-        )
 
+def _add_search(sub):
+    # Subcomando: search
     p_search = sub.add_parser(
         "search",
         help="Executa consultas de exemplo (lexical, semântica, híbrida) e opção de contexto no grafo",
@@ -59,24 +74,9 @@ def build_parser() -> argparse.ArgumentParser:
     p_search.add_argument("--no-explain", action="store_true", help="Não buscar contexto no grafo para o top-1")
     p_search.set_defaults(func=cmd_search)
 
-    # Subcomando: ask (RAG)
-    def cmd_ask(args):
-        from src.rag import run_rag
-
-        answer = run_rag(
-            query=args.query,
-            topk=args.topk,
-            provider=args.provider,
-            model_name=args.model,
-            temperature=args.temperature,
-            max_tokens=args.max_tokens,
-            use_hybrid=not args.no_hybrid,
-            filter_law=args.filter_law,
-            debug_print=args.debug,
-        )
-        # Imprime a resposta final do LLM
-        print(answer)
 
+def _add_ask(sub):
+    # Subcomando: ask (RAG)
     p_ask = sub.add_parser(
         "ask",
         help="Faz uma pergunta usando RAG (recupera evidências e gera resposta com LLM)",
@@ -101,12 +101,36 @@ def build_parser() -> argparse.ArgumentParser:
     p_ask.add_argument("--debug", action="store_true", help="Mostra prompts enviados ao LLM")
     p_ask.set_defaults(func=cmd_ask)
 
+
+SUBCOMMANDS = {
+    "ingest": _add_ingest,
+    "search": _add_search,
+    "ask": _add_ask,
+}
+
+
+def build_parser(argv=None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ia_rag",
+        description="Executa processos do pipeline (ingestão, etc.)",
+    )
+    sub = parser.add_subparsers(dest="command")
+
+    # Registra apenas o subparser do subcomando pedido; sem subcomando conhecido
+    # (ex.: --help ou comando inválido), registra todos para a ajuda/erro completos.
+    command = argv[0] if argv else None
+    if command in SUBCOMMANDS:
+        SUBCOMMANDS[command](sub)
+    else:
+        for add in SUBCOMMANDS.values():
+            add(sub)
+
     return parser
 
 
 def main(argv=None):
     argv = sys.argv[1:] if argv is None else argv
-    parser = build_parser()
+    parser = build_parser(argv)
     if not argv:
         # Comando padrão: ingest
         return cmd_ingest()
@@ -1,25 +1,65 @@
 import re
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from .models import Document, Chunk, LegalRef
 
 
 ART_RE = re.compile(r"\bArt\.\s*(\d+[A-Za-zº]*)\b", re.IGNORECASE)
 PAR_RE = re.compile(r"\b§\s*(\d+º?)\b|\bParágrafo\s+único\b", re.IGNORECASE)
 INCISO_RE = re.compile(r"\b([IVXLCDM]+)\s*[-–]\s", re.IGNORECASE)
+# ART_RE | PAR_RE | INCISO_RE em uma única alternação: uma passada por frase
+LEGAL_RE = re.compile(
+    r"(?P<art>\bArt\.\s*(?P<art_num>\d+[A-Za-zº]*)\b)"
+    r"|(?P<par>\b§\s*(\d+º?)\b|\bParágrafo\s+único\b)"
+    r"|(?P<inc>\b(?P<inc_num>[IVXLCDM]+)\s*[-–]\s)",
+    re.IGNORECASE,
+)
+SENT_BOUNDARY_RE = re.compile(r"(?<=[\.!?])\s+(?=[A-ZÁÉÍÓÚÂÊÎÔÛÃÕÇ])")
 
 
-def _simple_sentence_split(text: str) -> List[str]:
-    # Basic sentence splitter for Portuguese (period, question, exclamation)
-    parts = re.split(r"(?<=[\.!?])\s+(?=[A-ZÁÉÍÓÚÂÊÎÔÛÃÕÇ])", text)
-    return [p.strip() for p in parts if p.strip()]
+def _simple_sentence_split(text: str) -> List[Tuple[int, int, str]]:
+    # Basic sentence splitter for Portuguese (period, question, exclamation).
+    # Retorna (início, fim, frase) em uma única passada, com offsets exatos no texto.
+    spans: List[Tuple[int, int, str]] = []
+
+    def _add(a: int, b: int):
+        s = text[a:b]
+        stripped = s.strip()
+        if stripped:
+            start = a + (len(s) - len(s.lstrip()))
+            spans.append((start, start + len(stripped), stripped))
+
+    prev = 0
+    for m in SENT_BOUNDARY_RE.finditer(text):
+        _add(prev, m.start())
+        prev = m.end()
+    _add(prev, len(text))
+    return spans
+
+
+def _legal_markers(sentence: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """Primeiro artigo, parágrafo e inciso citados na frase (None quando ausentes)."""
+    art = par = inc = None
+    for m in LEGAL_RE.finditer(sentence):
+        kind = m.lastgroup
+        if kind == "art":
+            if art is None:
+                art = m.group("art_num")
+        elif kind == "par":
+            if par is None:
+                par = m.group("par")
+        elif inc is None:
+            inc = m.group("inc_num")
+        if art is not None and par is not None and inc is not None:
+            break
+    return art, par, inc
 
 
 def hybrid_chunk(document: Document, max_sentences: int = 6, overlap: int = 2) -> List[Chunk]:
     """Hybrid chunking: preserve legal structure markers and create sentence windows with overlap.
     Each chunk carries best-effort legal references (law/article/paragraph/inciso).
     """
-    text = document.content
-    sentences = _simple_sentence_split(text)
+    spans = _simple_sentence_split(document.content)
+    sentences = [s for _, _, s in spans]
     chunks: List[Chunk] = []
 
     # Track current legal context while iterating sentences
@@ -27,39 +67,35 @@ def hybrid_chunk(document: Document, max_sentences: int = 6, overlap: int = 2) -
     current_paragraph = None
     current_inciso = None
 
-    # Precompute sentence start positions
-    positions: List[Tuple[int, int]] = []
-    idx = 0
-    for s in sentences:
-        pos = text.find(s, idx)
-        if pos == -1:
-            pos = idx
-        positions.append((pos, pos + len(s)))
-        idx = pos + len(s)
+    # Marcadores legais de cada frase, calculados uma única vez (as frases de
+    # sobreposição aparecem em duas janelas, mas não são reprocessadas)
+    markers = [_legal_markers(s) for s in sentences]
+    seen = 0
 
     # Sliding window
     i = 0
     while i < len(sentences):
-        window = sentences[i : min(i + max_sentences, len(sentences))]
-        chunk_text = " ".join(window)
-
-        # update legal context based on sentences within the window
-        for s in window:
-            m_art = ART_RE.search(s)
-            if m_art:
-                current_article = m_art.group(1)
+        window_end = min(i + max_sentences, len(sentences))
+        chunk_text = " ".join(sentences[i:window_end])
+
+        # update legal context based on sentences within the window. Reaplicar as
+        # frases de sobreposição não altera o contexto, então só as novas são lidas.
+        # Artigo zera parágrafo e inciso; parágrafo zera inciso.
+        for j in range(max(i, seen), window_end):
+            art, par, inc = markers[j]
+            if art is not None:
+                current_article = art
                 current_paragraph = None
                 current_inciso = None
-            m_par = PAR_RE.search(s)
-            if m_par:
-                current_paragraph = m_par.group(0)
+            if par is not None:
+                current_paragraph = par
                 current_inciso = None
-            m_inc = INCISO_RE.search(s)
-            if m_inc:
-                current_inciso = m_inc.group(1)
+            if inc is not None:
+                current_inciso = inc
+        seen = max(seen, window_end)
 
-        start = positions[i][0]
-        end = positions[min(i + max_sentences, len(sentences)) - 1][1]
+        start = spans[i][0]
+        end = spans[window_end - 1][1]
 
         legal_ref = LegalRef(
             law_id=document.title,
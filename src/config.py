@@ -1,9 +1,10 @@
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 from dotenv import load_dotenv
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Settings:
     # Infra URLs
     elastic_url: str
@@ -17,16 +18,27 @@ class Settings:
     hf_token: str
     hf_local_files_only: bool
     emb_force_backend: str
+    emb_torch_compile: bool
+    emb_jit_cache_dir: str
     # Timeouts
     es_timeout: float
     neo4j_timeout: float
     qdrant_timeout: float
     qdrant_retries: int
+    qdrant_prefer_grpc: bool
+    qdrant_grpc_port: int
+    qdrant_quantization: bool
+    qdrant_upsert_parallelism: int
+    qdrant_max_connections: int
     # Data/indices
     data_dir: str
     qdrant_collection: str
     elastic_index: str
+    elastic_chunk_index: str
+    es_bulk_chunk: int
     qdrant_upsert_batch: int
+    ingest_batch: int
+    ingest_workers: int
     # LLM / RAG
     llm_provider: str
     gemini_api_key: str
@@ -35,7 +47,9 @@ class Settings:
     openai_model: str
 
 
+@lru_cache(maxsize=1)
 def load_settings() -> Settings:
+    """Lê o `.env` e as variáveis de ambiente uma única vez por processo."""
     load_dotenv()
     return Settings(
         elastic_url=os.getenv("ELASTICSEARCH_URL", "http://localhost:9200"),
@@ -47,14 +61,25 @@ def load_settings() -> Settings:
         hf_token=os.getenv("HUGGINGFACE_HUB_TOKEN", ""),
         hf_local_files_only=os.getenv("HF_LOCAL_FILES_ONLY", "false").lower() in ("1", "true", "yes"),
         emb_force_backend=os.getenv("EMB_FORCE_BACKEND", ""),
+        emb_torch_compile=os.getenv("EMB_TORCH_COMPILE", "false").lower() in ("1", "true", "yes"),
+        emb_jit_cache_dir=os.getenv("EMB_JIT_CACHE_DIR", ""),
         es_timeout=float(os.getenv("ES_TIMEOUT", "15")),
         neo4j_timeout=float(os.getenv("NEO4J_TIMEOUT", "15")),
         qdrant_timeout=float(os.getenv("QDRANT_TIMEOUT", "60")),
         qdrant_retries=int(os.getenv("QDRANT_RETRIES", "3")),
+        qdrant_prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "true").lower() in ("1", "true", "yes"),
+        qdrant_grpc_port=int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+        qdrant_upsert_parallelism=int(os.getenv("QDRANT_UPSERT_PARALLELISM", "4")),
+        qdrant_max_connections=int(os.getenv("QDRANT_MAX_CONNECTIONS", "100")),
+        qdrant_quantization=os.getenv("QDRANT_QUANTIZATION", "true").lower() in ("1", "true", "yes"),
         data_dir=os.getenv("DATA_DIR", "./data"),
         qdrant_collection=os.getenv("QDRANT_COLLECTION", "anvisa_chunks"),
         elastic_index=os.getenv("ELASTIC_INDEX", "anvisa_docs"),
+        elastic_chunk_index=os.getenv("ELASTIC_CHUNK_INDEX", ""),
+        es_bulk_chunk=int(os.getenv("ES_BULK_CHUNK", "500")),
         qdrant_upsert_batch=int(os.getenv("QDRANT_UPSERT_BATCH", "256")),
+        ingest_batch=int(os.getenv("INGEST_BATCH", "256")),
+        ingest_workers=int(os.getenv("INGEST_WORKERS") or os.cpu_count() or 1),
         llm_provider=os.getenv("LLM_PROVIDER", "gemini"),
         gemini_api_key=os.getenv("GEMINI_API_KEY", ""),
         gemini_model=os.getenv("GEMINI_MODEL", "gemini-3-pro-preview"),
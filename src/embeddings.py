@@ -1,6 +1,16 @@
-from typing import List, Optional
-import numpy as np
-import torch
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
+
+if TYPE_CHECKING:  # torch/numpy são importados sob demanda (import de torch custa ~1-2s)
+    import numpy as np
+
+# Timeout (s) de socket durante o carregamento do modelo (consultas ao Hugging Face Hub)
+HUB_SOCKET_TIMEOUT = 5.0
 
 
 class Embeddings:
@@ -17,12 +27,25 @@ class Embeddings:
         hf_token: Optional[str] = None,
         local_files_only: bool = False,
         force_backend: Optional[str] = None,
+        compile_model: bool = False,
+        jit_cache_dir: Optional[str] = None,
     ):
+        import torch
+
         self.model_name = model_name
         self.hf_token = (hf_token or "").strip()
         self.local_files_only = bool(local_files_only)
         self.backend = "st"  # or "hf"
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        # Precisão reduzida do backend HF (apenas em GPU); None = float32
+        self._amp_dtype = None
+        # True quando o backend HF usa o módulo TorchScript do cache (chamada posicional)
+        self._jit = False
+        if self.device.type == "cuda":
+            # TF32 nas multiplicações de matrizes em float32 (Ampere+)
+            torch.set_float32_matmul_precision("high")
+            # Inferência em meia precisão: BF16 em Ampere+, FP16 nas demais GPUs
+            self._amp_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
 
         BACKUP_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
         # Ordem de tentativa: controlada por force_backend e heurística do nome do modelo
@@ -79,10 +102,32 @@ class Embeddings:
                     tok_kwargs["token"] = self.hf_token
                     mdl_kwargs["token"] = self.hf_token
 
-                self._hf_tokenizer = AutoTokenizer.from_pretrained(model_name, **tok_kwargs)
-                self._hf_model = AutoModel.from_pretrained(model_name, **mdl_kwargs)
-                self._hf_model.to(self.device)
-                hidden = getattr(getattr(self._hf_model, "config", None), "hidden_size", None)
+                # Tokenizer rápido (Rust): tokeniza listas inteiras em paralelo
+                self._hf_tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True, **tok_kwargs)
+                if not getattr(self._hf_tokenizer, "is_fast", False):
+                    raise RuntimeError(f"Tokenizer rápido indisponível para '{model_name}'")
+                jit_path = self._jit_cache_path(jit_cache_dir) if jit_cache_dir else None
+                if jit_path and os.path.exists(jit_path):
+                    # Módulo TorchScript salvo em uma execução anterior: evita o from_pretrained
+                    extra = {"meta.json": ""}
+                    self._hf_model = torch.jit.load(jit_path, map_location=self.device, _extra_files=extra)
+                    self._hf_model.eval()
+                    self._jit = True
+                    hidden = json.loads(extra["meta.json"] or "{}").get("hidden_size")
+                    print(f"[Embeddings] Modelo TorchScript carregado do cache: {jit_path}")
+                else:
+                    self._hf_model = AutoModel.from_pretrained(model_name, **mdl_kwargs)
+                    self._hf_model.to(self.device)
+                    # Modo de inferência: desliga dropout
+                    self._hf_model.eval()
+                    if self._amp_dtype is not None:
+                        self._hf_model = self._hf_model.to(dtype=self._amp_dtype)
+                    hidden = getattr(getattr(self._hf_model, "config", None), "hidden_size", None)
+                    if jit_path:
+                        self._save_jit(jit_path, hidden)
+                if compile_model and not self._jit and hasattr(torch, "compile"):
+                    # PyTorch 2.x: funde o forward do encoder em um grafo (1ª chamada mais lenta)
+                    self._hf_model = torch.compile(self._hf_model, mode="reduce-overhead", fullgraph=False)
                 if not hidden:
                     hidden = 768
                 self.dim = int(hidden)
@@ -99,46 +144,100 @@ class Embeddings:
                     )
                 return False
 
-        # Tenta na ordem definida
-        if try_hf_first:
-            if _load_hf() or _load_st():
-                return
-        else:
-            if _load_st() or _load_hf():
+        # Falhas de rede ao consultar o Hub devem falhar rápido em vez de aguardar o
+        # timeout TCP padrão (só aplicado se o processo não definiu um timeout global)
+        prev_timeout = socket.getdefaulttimeout()
+        if prev_timeout is None:
+            socket.setdefaulttimeout(HUB_SOCKET_TIMEOUT)
+        try:
+            # Tenta na ordem definida
+            if try_hf_first:
+                if _load_hf() or _load_st():
+                    return
+            else:
+                if _load_st() or _load_hf():
+                    return
+
+            # Offline: o fallback exigiria baixar outro modelo do Hub
+            if self.local_files_only:
+                raise RuntimeError(
+                    f"Falha ao carregar embeddings '{model_name}' com HF_LOCAL_FILES_ONLY=true "
+                    f"(fallback '{BACKUP_MODEL}' ignorado). Erros: ST={st_err} | HF={hf_err}"
+                )
+
+            # Fallback final para um modelo público estável
+            try:
+                from sentence_transformers import SentenceTransformer  # type: ignore
+                self._st_model = SentenceTransformer(BACKUP_MODEL)
+                self.dim = self._st_model.get_sentence_embedding_dimension()
+                self.backend = "st"
+                print(
+                    f"[Embeddings] Aviso: não foi possível carregar '{model_name}' (ST={st_err} | HF={hf_err}). "
+                    f"Usando fallback '{BACKUP_MODEL}' (dim={self.dim})."
+                )
                 return
+            except Exception as e_bk:
+                raise RuntimeError(
+                    f"Falha ao carregar embeddings. Tentativas: ordem={'HF->ST' if try_hf_first else 'ST->HF'}.\n"
+                    f"Erros: ST={st_err} | HF={hf_err} | BK={e_bk}"
+                )
+        finally:
+            socket.setdefaulttimeout(prev_timeout)
 
-        # Fallback final para um modelo público estável
-        try:
-            from sentence_transformers import SentenceTransformer  # type: ignore
-            st_kwargs = {"local_files_only": self.local_files_only}
-            self._st_model = SentenceTransformer(BACKUP_MODEL, **st_kwargs)
-            self.dim = self._st_model.get_sentence_embedding_dimension()
-            self.backend = "st"
-            print(
-                f"[Embeddings] Aviso: não foi possível carregar '{model_name}' (ST={st_err} | HF={hf_err}). "
-                f"Usando fallback '{BACKUP_MODEL}' (dim={self.dim})."
-            )
-            return
-        except Exception as e_bk:
-            raise RuntimeError(
-                f"Falha ao carregar embeddings. Tentativas: ordem={'HF->ST' if try_hf_first else 'ST->HF'}.\n"
-                f"Erros: ST={st_err} | HF={hf_err} | BK={e_bk}"
-            )
+    def _jit_cache_path(self, cache_dir: str) -> str:
+        """Caminho do módulo TorchScript; a chave muda com modelo, versões, device e dtype."""
+        import torch
+        import transformers  # type: ignore
 
-    def _hf_encode_batch(self, batch_texts: List[str]) -> np.ndarray:
-        # Tokeniza com truncation para 512 tokens (BERT/LegaL-BERT)
-        toks = self._hf_tokenizer(
-            batch_texts,
-            padding=True,
-            truncation=True,
-            max_length=512,
-            return_tensors="pt",
+        key = "|".join(
+            [self.model_name, transformers.__version__, torch.__version__, self.device.type, str(self._amp_dtype)]
         )
-        toks = {k: v.to(self.device) for k, v in toks.items()}
-        with torch.no_grad():
-            out = self._hf_model(**toks)
-            last_hidden = out.last_hidden_state  # [B, T, H]
-            attention_mask = toks["attention_mask"].unsqueeze(-1).expand(last_hidden.size())  # [B, T, H]
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(cache_dir, f"{self.model_name.strip('/').replace('/', '--')}-{digest}.pt")
+
+    def _save_jit(self, path: str, hidden: Optional[int]) -> None:
+        """Salva o modelo HF rastreado (torch.jit.trace). Falhas só geram aviso."""
+        import torch
+
+        try:
+            # Exemplo com 2 textos de tamanhos diferentes: o trace registra o padding
+            example = self._hf_tokenizer(["a", "Art. 1º Esta lei dispõe sobre"], padding=True, return_tensors="pt")
+            args = (example["input_ids"].to(self.device), example["attention_mask"].to(self.device))
+            with torch.inference_mode():
+                traced = torch.jit.trace(self._hf_model, args, strict=False)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = f"{path}.tmp"
+            torch.jit.save(traced, tmp, _extra_files={"meta.json": json.dumps({"hidden_size": hidden})})
+            os.replace(tmp, path)
+            print(f"[Embeddings] Modelo TorchScript salvo em cache: {path}")
+        except Exception as e:
+            print(f"[Embeddings] Aviso: não foi possível salvar o cache TorchScript ({e}).")
+
+    def _hf_encode_batch(self, features: List[Dict[str, List[int]]]) -> np.ndarray:
+        import torch
+
+        # Padding apenas até o maior item do lote (entradas já tokenizadas e truncadas)
+        toks = self._hf_tokenizer.pad(features, padding=True, return_tensors="pt")
+        if self.device.type == "cuda":
+            # memória fixada + cópia assíncrona: a transferência sobrepõe o cálculo do lote anterior
+            toks = {k: v.pin_memory().to(self.device, non_blocking=True) for k, v in toks.items()}
+        else:
+            toks = {k: v.to(self.device) for k, v in toks.items()}
+        with torch.inference_mode():
+            with torch.autocast(
+                device_type=self.device.type,
+                dtype=self._amp_dtype,
+                enabled=self._amp_dtype is not None,
+            ):
+                if self._jit:
+                    # módulo rastreado: entradas posicionais, saída como dict ou tupla
+                    out = self._hf_model(toks["input_ids"], toks["attention_mask"])
+                    last_hidden = out["last_hidden_state"] if isinstance(out, dict) else out[0]
+                else:
+                    last_hidden = self._hf_model(**toks).last_hidden_state
+            # pooling e normalização em float32 para estabilidade numérica
+            last_hidden = last_hidden.float()  # [B, T, H]
+            attention_mask = toks["attention_mask"].unsqueeze(-1).expand(last_hidden.size()).float()  # [B, T, H]
             # mean pooling mascarada
             sum_embeddings = (last_hidden * attention_mask).sum(dim=1)
             sum_mask = attention_mask.sum(dim=1).clamp(min=1e-9)
@@ -147,9 +246,15 @@ class Embeddings:
             emb = torch.nn.functional.normalize(emb, p=2, dim=1)
         return emb.cpu().numpy()
 
-    def encode(self, texts: List[str], batch_size: int = 64) -> List[List[float]]:
+    def encode(self, texts: List[str], batch_size: int = 64, as_list: bool = False) -> Union[np.ndarray, List[List[float]]]:
+        """Retorna os embeddings normalizados como `np.ndarray` float32 de forma [N, D].
+        Use `as_list=True` apenas para consumidores que ainda esperam listas Python.
+        """
+        import numpy as np
+
         if not texts:
-            return []
+            empty = np.empty((0, self.dim), dtype=np.float32)
+            return empty.tolist() if as_list else empty
         if self.backend == "st" and self._st_model is not None:
             # Sentence-Transformers otimizado
             arr = self._st_model.encode(
@@ -158,12 +263,21 @@ class Embeddings:
                 convert_to_numpy=True,
                 normalize_embeddings=True,
             )
-            return arr.tolist()
-
-        # Transformers puro: processa em lotes
-        embeddings: List[np.ndarray] = []
-        for i in range(0, len(texts), batch_size):
-            arr = self._hf_encode_batch(texts[i : i + batch_size])
-            embeddings.append(arr)
-        all_emb = np.vstack(embeddings)
-        return all_emb.tolist()
+        else:
+            # Transformers puro: tokeniza tudo de uma vez (sem padding, truncado em 512 tokens
+            # para BERT/Legal-BERT) e processa em lotes de textos com nº de tokens próximo,
+            # minimizando o padding de cada lote
+            enc = self._hf_tokenizer(texts, padding=False, truncation=True, max_length=512)
+            keys = list(enc.keys())
+            features = [{k: enc[k][i] for k in keys} for i in range(len(texts))]
+            order = sorted(range(len(texts)), key=lambda i: len(features[i]["input_ids"]))
+            sorted_features = [features[i] for i in order]
+            embeddings: List[np.ndarray] = []
+            for i in range(0, len(sorted_features), batch_size):
+                embeddings.append(self._hf_encode_batch(sorted_features[i : i + batch_size]))
+            sorted_arr = np.vstack(embeddings)
+            # devolve na ordem original
+            arr = np.empty_like(sorted_arr)
+            arr[order] = sorted_arr
+        arr = np.ascontiguousarray(arr, dtype=np.float32)
+        return arr.tolist() if as_list else arr
@@ -1,24 +1,230 @@
+from __future__ import annotations
+
+import multiprocessing
 import os
-from typing import List, Dict
-from tqdm import tqdm
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, islice
+from typing import TYPE_CHECKING, Any, List, Dict, Iterable, Iterator, Optional, Tuple
 
 from .config import load_settings
-from .parsers import load_documents
+from .parsers import list_document_files, parse_document
 from .chunker import hybrid_chunk
-from .embeddings import Embeddings
-from .stores.elasticsearch_store import ElasticsearchStore
-from .stores.qdrant_store import QdrantStore
-from .stores.neo4j_store import Neo4jStore
+from .models import Document, Chunk
+
+if TYPE_CHECKING:
+    from .embeddings import Embeddings
+    from .stores.elasticsearch_store import ElasticsearchStore
+    from .stores.neo4j_store import Neo4jStore
+
+
+def _parse_and_chunk(path: str) -> Optional[Tuple[Document, List[Chunk]]]:
+    """Lê um arquivo e gera seus chunks no mesmo processo (função de módulo: serializável
+    para o pool). None para extensões não suportadas.
+    """
+    doc = parse_document(path)
+    if doc is None:
+        return None
+    return doc, hybrid_chunk(doc)
+
+
+def _iter_parsed(paths: List[str], workers: int = 1) -> Iterator[Tuple[Document, List[Chunk]]]:
+    """(documento, chunks) de cada arquivo, na ordem de `paths`. Com `workers > 1`, parsing e
+    chunking (CPU puro) rodam juntos em um único pool de processos, com no máximo
+    `2 * workers` arquivos em voo: cada documento cruza a fronteira de processos uma vez.
+    Os workers são criados com "spawn". Em `main` o pool nasce na thread principal, no
+    `next()` que detecta pasta vazia, antes dos clientes (Embeddings, Qdrant, Neo4j), mas o
+    torch já está importado nesse ponto e não é seguro contra fork. Com spawn os workers
+    também só importam parsers/chunker (não herdam a memória do torch) e continuam seguros
+    se a ordem de inicialização em `main` mudar.
+    """
+    from tqdm import tqdm
+
+    with tqdm(total=len(paths), desc="Lendo e gerando chunks", unit="doc") as bar:
+        if workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                item = _parse_and_chunk(path)
+                bar.update()
+                if item is not None:
+                    yield item
+            return
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths)), mp_context=ctx) as ex:
+            pending: deque = deque()
+            for path in paths:
+                pending.append(ex.submit(_parse_and_chunk, path))
+                if len(pending) >= 2 * workers:
+                    item = pending.popleft().result()
+                    bar.update()
+                    if item is not None:
+                        yield item
+            while pending:
+                item = pending.popleft().result()
+                bar.update()
+                if item is not None:
+                    yield item
+
+
+def _index_documents(
+    items: Iterable[Tuple[Document, List[Chunk]]],
+    es: ElasticsearchStore,
+    chunk_size: int,
+    stats: Dict[str, Any],
+) -> Iterator[Tuple[Document, List[Chunk]]]:
+    """Repassa os pares (documento, chunks) adiante e, no caminho, indexa os documentos no
+    Elasticsearch com uma requisição _bulk a cada `chunk_size` documentos. Totais e erros
+    vão para `stats`.
+    """
+    pending: List[Tuple[str, Dict]] = []
+
+    def _flush():
+        ok, errors = es.bulk_index(pending, chunk_size=chunk_size)
+        stats["ok"] += ok
+        stats["errors"] += len(errors)
+        if errors and stats["first_error"] is None:
+            stats["first_error"] = errors[0]
+        pending.clear()
+
+    for d, chunks in items:
+        pending.append(
+            (
+                d.doc_id,
+                {
+                    "title": d.title,
+                    "content": d.content,
+                    "source_path": d.source_path,
+                    "meta": d.meta,
+                },
+            )
+        )
+        if len(pending) >= chunk_size:
+            _flush()
+        yield d, chunks
+    if pending:
+        _flush()
+
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    # put com timeout para não travar caso o consumidor tenha falhado
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce_batches(
+    items: Iterable[Tuple[Document, List[Chunk]]],
+    neo: Neo4jStore,
+    batch_size: int,
+    out: queue.Queue,
+    stop: threading.Event,
+):
+    """Produtor do pipeline de ingestão: agrupa os chunks dos documentos em lotes, grava a
+    hierarquia no Neo4j e enfileira (ids, textos, payloads) para embeddings + upsert no
+    Qdrant. Sempre enfileira `None` ao final para sinalizar o fim ao consumidor.
+    """
+    chunks = chain.from_iterable(c for _, c in items)
+    try:
+        for batch in _batched(chunks, max(1, int(batch_size))):
+            ids: List[str] = []
+            texts: List[str] = []
+            payloads: List[Dict] = []
+            rows: List[Dict] = []
+            for c in batch:
+                rows.append(
+                    {
+                        "law_id": c.legal_ref.law_id,
+                        "article": c.legal_ref.article,
+                        "paragraph": c.legal_ref.paragraph,
+                        "inciso": c.legal_ref.inciso,
+                        "chunk_id": c.chunk_id,
+                        "text": c.text,
+                        "start": c.start_char,
+                        "end": c.end_char,
+                    }
+                )
+                ids.append(c.chunk_id)
+                texts.append(c.text)
+                payloads.append(
+                    {
+                        "chunk_id": c.chunk_id,
+                        "doc_id": c.doc_id,
+                        "law_id": c.legal_ref.law_id,
+                        "article": c.legal_ref.article,
+                        "paragraph": c.legal_ref.paragraph,
+                        "inciso": c.legal_ref.inciso,
+                        "start": c.start_char,
+                        "end": c.end_char,
+                    }
+                )
+            neo.bulk_upsert(rows)
+            if not _put(out, (ids, texts, payloads), stop):
+                return
+    finally:
+        _put(out, None, stop)
+
+
+def _embedded_points(
+    batches: queue.Queue,
+    emb: Embeddings,
+    es_chunks: Optional[ElasticsearchStore],
+    chunk_size: int,
+    stats: Dict[str, int],
+) -> Iterator[Tuple[str, Any, Dict]]:
+    """Consome os lotes do produtor até o `None` final: gera os embeddings de cada lote,
+    indexa os chunks no ES (quando há índice de chunks) e repassa (id, vetor, payload) de
+    cada ponto para o Qdrant. Totais vão para `stats`.
+    """
+    while True:
+        item = batches.get()
+        if item is None:
+            return
+        ids, texts, payloads = item
+        vectors = emb.encode(texts, batch_size=64)
+        if es_chunks is not None:
+            _, errors = es_chunks.bulk_index(
+                (
+                    (cid, {**payload, "text": text, "embedding": vec})
+                    for cid, text, payload, vec in zip(ids, texts, payloads, vectors)
+                ),
+                chunk_size=chunk_size,
+            )
+            stats["es_chunk_errors"] += len(errors)
+        stats["total"] += len(ids)
+        yield from zip(ids, vectors, payloads)
 
 
 def main():
+    # Imports pesados (torch, clientes dos bancos) adiados até a ingestão de fato rodar
+    from .embeddings import Embeddings
+    from .stores.elasticsearch_store import ElasticsearchStore
+    from .stores.qdrant_store import QdrantStore
+    from .stores.neo4j_store import Neo4jStore
+
     cfg = load_settings()
 
-    # Load source documents
-    docs = load_documents(cfg.data_dir)
-    if not docs:
+    # Documentos lidos e fatiados em chunks sob demanda; o primeiro é antecipado só para
+    # detectar pasta vazia
+    items_iter = _iter_parsed(list_document_files(cfg.data_dir), workers=cfg.ingest_workers)
+    first = next(items_iter, None)
+    if first is None:
         print(f"Nenhum documento encontrado em {cfg.data_dir}.")
         return
+    items = chain([first], items_iter)
 
     # Initialize components
     print("[Ingest] Inicializando embeddings...")
@@ -27,10 +233,17 @@ def main():
         hf_token=cfg.hf_token,
         local_files_only=cfg.hf_local_files_only,
         force_backend=cfg.emb_force_backend,
+        compile_model=cfg.emb_torch_compile,
+        jit_cache_dir=cfg.emb_jit_cache_dir or None,
     )
     print("[Ingest] Inicializando ElasticsearchStore e garantindo índice...")
     es = ElasticsearchStore(cfg.elastic_url, cfg.elastic_index, timeout=cfg.es_timeout)
     es.ensure_index()
+    es_chunks = None
+    if cfg.elastic_chunk_index:
+        # Opcional: chunks + embeddings também no ES, para a busca híbrida em uma requisição
+        es_chunks = ElasticsearchStore(cfg.elastic_url, cfg.elastic_chunk_index, timeout=cfg.es_timeout)
+        es_chunks.ensure_chunk_index(emb.dim)
     print("[Ingest] Inicializando QdrantStore e garantindo coleção...")
     qd = QdrantStore(
         cfg.qdrant_url,
@@ -39,61 +252,52 @@ def main():
         upsert_batch=cfg.qdrant_upsert_batch,
         timeout=cfg.qdrant_timeout,
         retries=cfg.qdrant_retries,
+        prefer_grpc=cfg.qdrant_prefer_grpc,
+        grpc_port=cfg.qdrant_grpc_port,
+        quantization=cfg.qdrant_quantization,
+        parallelism=cfg.qdrant_upsert_parallelism,
+        max_connections=cfg.qdrant_max_connections,
     )
     qd.ensure_collection()
     print("[Ingest] Inicializando Neo4jStore e garantindo schema...")
     neo = Neo4jStore(cfg.neo4j_url, cfg.neo4j_user, cfg.neo4j_password, timeout=cfg.neo4j_timeout)
     neo.ensure_schema()
 
-    # Index documents to Elasticsearch
-    print("[Ingest] Indexando documentos no Elasticsearch...")
-    for d in docs:
-        es.index_document(
-            d.doc_id,
-            {
-                "title": d.title,
-                "content": d.content,
-                "source_path": d.source_path,
-                "meta": d.meta,
-            },
-        )
+    # Pipeline em uma única passada pelos documentos: o pool lê e fatia cada arquivo; uma
+    # thread indexa os documentos no Elasticsearch (_bulk a cada es_bulk_chunk docs) e
+    # popula o Neo4j com os chunks, enquanto
+    # a thread principal gera embeddings e envia ao Qdrant, lote a lote, sem materializar
+    # o corpus nem todos os chunks.
+    print("[Ingest] Indexando no Elasticsearch, gerando chunks, embeddings e populando Neo4j/Qdrant (em lotes)...")
+    es_stats: Dict[str, Any] = {"ok": 0, "errors": 0, "first_error": None}
+    items = _index_documents(items, es, cfg.es_bulk_chunk, es_stats)
+    batches: "queue.Queue[Optional[Tuple[List[str], List[str], List[Dict]]]]" = queue.Queue(maxsize=4)
+    stop = threading.Event()
+    stats = {"total": 0, "es_chunk_errors": 0}
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        producer = ex.submit(_produce_batches, items, neo, cfg.ingest_batch, batches, stop)
+        try:
+            # Os pontos seguem ao Qdrant em janelas de QDRANT_UPSERT_BATCH * parallelism, com
+            # wait=False (o Qdrant confirma ao registrar, e a indexação corre em paralelo com
+            # os próximos embeddings); a última janela vai com wait=True e, como o Qdrant
+            # aplica as operações em ordem, só retorna com todos indexados
+            qd.upsert_iter(_embedded_points(batches, emb, es_chunks, cfg.es_bulk_chunk, stats))
+        finally:
+            stop.set()
+        producer.result()
+    total = stats["total"]
+    es_chunk_errors = stats["es_chunk_errors"]
 
-    # Chunk, embed, and store chunks
-    print("[Ingest] Gerando chunks e populando Neo4j...")
-    all_chunk_ids: List[str] = []
-    all_texts: List[str] = []
-    all_payloads: List[Dict] = []
-
-    for d in tqdm(docs, desc="Gerando chunks"):
-        chunks = hybrid_chunk(d)
-        for c in chunks:
-            parent_label, parent_id = neo.upsert_hierarchy(
-                c.legal_ref.law_id,
-                c.legal_ref.article,
-                c.legal_ref.paragraph,
-                c.legal_ref.inciso,
-            )
-            neo.attach_chunk(parent_id=parent_id, chunk_id=c.chunk_id, text=c.text, start_char=c.start_char, end_char=c.end_char)
-            all_chunk_ids.append(c.chunk_id)
-            all_texts.append(c.text)
-            all_payloads.append(
-                {
-                    "doc_id": c.doc_id,
-                    "law_id": c.legal_ref.law_id,
-                    "article": c.legal_ref.article,
-                    "paragraph": c.legal_ref.paragraph,
-                    "inciso": c.legal_ref.inciso,
-                    "start": c.start_char,
-                    "end": c.end_char,
-                }
-            )
-
-    if all_texts:
-        print(f"[Ingest] Gerando embeddings para {len(all_texts)} chunks...")
-        vectors = emb.encode(all_texts, batch_size=64)
-        print("[Ingest] Upsert dos vetores no Qdrant (em lotes)...")
-        qd.upsert(all_chunk_ids, vectors, all_payloads)
-        print(f"[Ingest] Vetores inseridos no Qdrant: {len(all_texts)} chunks.")
+    print(f"[Ingest] Documentos indexados no Elasticsearch: {es_stats['ok']}.")
+    if es_stats["errors"]:
+        print(
+            f"[Ingest] Aviso: {es_stats['errors']} documentos falharam no bulk do Elasticsearch. "
+            f"Primeiro erro: {es_stats['first_error']}"
+        )
+    if es_chunk_errors:
+        print(f"[Ingest] Aviso: {es_chunk_errors} chunks falharam no índice {cfg.elastic_chunk_index}.")
+    if total:
+        print(f"[Ingest] Vetores inseridos no Qdrant: {total} chunks.")
     else:
         print("Nenhum chunk gerado.")
 
@@ -2,7 +2,7 @@ from dataclasses import dataclass, field
 from typing import List, Optional, Dict
 
 
-@dataclass
+@dataclass(slots=True)
 class LegalRef:
     law_id: str
     article: Optional[str] = None
@@ -10,7 +10,7 @@ class LegalRef:
     inciso: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Document:
     doc_id: str
     title: str
@@ -19,7 +19,7 @@ class Document:
     meta: Dict[str, str] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class Chunk:
     chunk_id: str
     doc_id: str
@@ -28,4 +28,5 @@ class Chunk:
     start_char: int
     end_char: int
     tokens: int = 0
-    extra: Dict[str, str] = field(default_factory=dict)
\ No newline at end of file
+    # None até ser usado: evita um dict vazio por chunk
+    extra: Optional[Dict[str, str]] = None
\ No newline at end of file
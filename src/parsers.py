@@ -1,73 +1,139 @@
 import os
 import re
-from typing import List, Tuple
-from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
+from typing import List, Optional
+from charset_normalizer import from_bytes
+from lxml import etree
+from lxml import html as lxml_html
 from .models import Document
 
+# Motores de PDF em C, em ordem de preferência: PyMuPDF (MuPDF) e pypdfium2 (PDFium).
+# Sem nenhum deles, os PDFs são lidos com PyPDF2 (Python puro, bem mais lento).
+try:
+    import pymupdf
+except ImportError:  # pragma: no cover
+    pymupdf = None
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # pragma: no cover
+    pdfium = None
 
-ART_RE = re.compile(r"\bArt\.\s*(\d+[A-Za-zº]*)\b", re.IGNORECASE)
-PAR_RE = re.compile(r"\b§\s*(\d+º?)\b|\bParágrafo\s+único\b", re.IGNORECASE)
-INCISO_RE = re.compile(r"\b([IVXLCDM]+)\s*[-–]\s", re.IGNORECASE)
+
+_MULTI_NL = re.compile(r"\n{2,}")
+# O texto já chega decodificado; o parser recebe UTF-8 e ignora o <meta charset> do arquivo
+_HTML_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+_ASCII_WS = " \t\n\r\f"
 
 
 def _read_html(path: str) -> str:
-    # Tenta múltiplos encodings comuns em documentos brasileiros
-    encodings = ["utf-8", "latin-1", "iso-8859-1", "cp1252", "windows-1252"]
-    html = None
-    
-    for enc in encodings:
-        try:
-            with open(path, "r", encoding=enc) as f:
-                html = f.read()
-            # Verifica se tem caracteres estranhos (indica encoding errado)
-            if "Ã" not in html or enc == encodings[-1]:
-                break
-        except (UnicodeDecodeError, LookupError):
-            continue
-    
-    if html is None:
-        # Fallback: lê como bytes e tenta detectar
-        with open(path, "rb") as f:
-            raw = f.read()
-        html = raw.decode("utf-8", errors="replace")
-    
-    soup = BeautifulSoup(html, "lxml")
-    # Remove scripts/styles
-    for t in soup(["script", "style"]):
-        t.extract()
-    text = soup.get_text("\n")
+    # Lê os bytes uma única vez. UTF-8 válido é aceito direto; senão, o encoding é
+    # detectado estatisticamente (documentos brasileiros antigos costumam ser cp1252/latin-1)
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        html = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        best = from_bytes(raw).best()
+        html = str(best) if best is not None else raw.decode("utf-8", errors="replace")
+
+    if not html.strip():
+        return ""
+    try:
+        tree = lxml_html.fromstring(html.encode("utf-8"), parser=_HTML_PARSER)
+    except etree.ParserError:
+        # "Document is empty": só comentários/doctype, sem nenhum elemento
+        return ""
+    # Remove scripts/styles (e comentários), preservando o texto que vem depois deles
+    etree.strip_elements(tree, etree.Comment, "script", "style", with_tail=False)
+    # um nó de texto por linha, como o get_text("\n") do BeautifulSoup (que também reduz
+    # nós só com espaços ASCII a uma quebra de linha ou um espaço)
+    text = "\n".join(
+        t if t.strip(_ASCII_WS) else ("\n" if "\n" in t else " ") for t in tree.itertext()
+    )
     # collapse multiple newlines
-    text = re.sub(r"\n{2,}", "\n\n", text)
+    text = _MULTI_NL.sub("\n\n", text)
     return text.strip()
 
 
-def _read_pdf(path: str) -> str:
-    reader = PdfReader(path)
+def _pdf_pages_pymupdf(path: str) -> List[str]:
     texts = []
+    with pymupdf.open(path) as doc:
+        for page in doc:
+            try:
+                texts.append(page.get_text("text"))
+            except Exception:
+                continue
+    return texts
+
+
+def _pdf_pages_pdfium(path: str) -> List[str]:
+    texts = []
+    pdf = pdfium.PdfDocument(path)
+    try:
+        for page in pdf:
+            try:
+                textpage = page.get_textpage()
+                # PDFium separa linhas com \r\n
+                texts.append(textpage.get_text_range().replace("\r\n", "\n"))
+                textpage.close()
+            except Exception:
+                continue
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+    return texts
+
+
+def _pdf_pages_pypdf2(path: str) -> List[str]:
+    from PyPDF2 import PdfReader
+
+    texts = []
+    reader = PdfReader(path)
     for page in reader.pages:
         try:
             texts.append(page.extract_text() or "")
         except Exception:
             continue
+    return texts
+
+
+def _read_pdf(path: str) -> str:
+    # Páginas extraídas em sequência: documentos do MuPDF/PDFium não são thread-safe e o
+    # paralelismo já vem do pool de processos por arquivo (ingest._iter_parsed)
+    if pymupdf is not None:
+        texts = _pdf_pages_pymupdf(path)
+    elif pdfium is not None:
+        texts = _pdf_pages_pdfium(path)
+    else:
+        texts = _pdf_pages_pypdf2(path)
     text = "\n".join(texts)
-    text = re.sub(r"\n{2,}", "\n\n", text)
+    text = _MULTI_NL.sub("\n\n", text)
     return text.strip()
 
 
-def load_documents(data_dir: str) -> List[Document]:
-    docs: List[Document] = []
-    for name in os.listdir(data_dir):
-        path = os.path.join(data_dir, name)
-        if not os.path.isfile(path):
-            continue
-        if name.lower().endswith((".html", ".htm")):
-            content = _read_html(path)
-        elif name.lower().endswith(".pdf"):
-            content = _read_pdf(path)
-        else:
-            continue
-        title = os.path.splitext(name)[0]
-        doc_id = title
-        docs.append(Document(doc_id=doc_id, title=title, source_path=path, content=content))
-    return docs
+def parse_document(path: str) -> Optional[Document]:
+    """Lê um arquivo HTML/PDF (função de módulo: serializável para o pool de processos).
+    Retorna None para extensões não suportadas.
+    """
+    name = os.path.basename(path)
+    low = name.lower()
+    if low.endswith((".html", ".htm")):
+        content = _read_html(path)
+    elif low.endswith(".pdf"):
+        content = _read_pdf(path)
+    else:
+        return None
+    title = os.path.splitext(name)[0]
+    doc_id = title
+    return Document(doc_id=doc_id, title=title, source_path=path, content=content)
+
+
+def list_document_files(data_dir: str) -> List[str]:
+    """Caminhos dos arquivos HTML/PDF de `data_dir`, na ordem de listagem do diretório."""
+    # scandir: o tipo de cada entrada vem da própria listagem (sem um stat por arquivo)
+    with os.scandir(data_dir) as it:
+        return [
+            entry.path
+            for entry in it
+            if entry.is_file() and entry.name.lower().endswith((".html", ".htm", ".pdf"))
+        ]
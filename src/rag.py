@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
 
@@ -9,9 +11,57 @@ from neo4j import GraphDatabase, Driver
 
 from .config import load_settings
 from .llm_providers import make_provider
-from .search import bootstrap_clients as bootstrap_search_clients
+from .search import QDRANT_SEARCH_PARAMS, bootstrap_clients as bootstrap_search_clients, embed_query
 from .embeddings import Embeddings
 
+try:  # pyahocorasick é opcional: sem ele, a busca de termos usa a alternação regex
+    import ahocorasick
+except ImportError:  # pragma: no cover
+    ahocorasick = None
+
+# separa por ponto final, quebras de linha e ponto e vírgula (resposta extrativa). Sem
+# lookbehind: a pontuação entra no match e é devolvida à frase em _split_sentences
+_SENT_RE = re.compile(r"[.!?]\s+|\n+|;\s+")
+
+# termos que marcam trechos de infrações/penalidades na resposta extrativa; uma única
+# alternação compilada faz uma varredura por frase em vez de uma busca por termo
+_FALLBACK_KEYWORDS = (
+    "infração", "infrações", "penalidade", "penalidades", "sanção", "sanções",
+    "multa", "advertência", "interdição", "suspensão", "cancelamento", "apreensão",
+)
+_KEYWORDS_RE = re.compile("|".join(map(re.escape, _FALLBACK_KEYWORDS)))
+
+
+def _keyword_matcher():
+    """Função `frase -> bool` que indica se há algum termo de _FALLBACK_KEYWORDS.
+    Com pyahocorasick, um autômato de Aho-Corasick varre a frase uma vez para todos
+    os termos (custo independente do nº de termos); senão, usa _KEYWORDS_RE.
+    """
+    if ahocorasick is None:
+        return lambda s: _KEYWORDS_RE.search(s) is not None
+    automaton = ahocorasick.Automaton()
+    for word in _FALLBACK_KEYWORDS:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return lambda s: next(automaton.iter(s), None) is not None
+
+
+_has_keyword = _keyword_matcher()
+
+
+def _split_sentences(txt: str) -> List[str]:
+    """Equivale a `re.split(r"(?<=[.!?])\\s+|\\n+|;\\s+", txt)` em uma única passada."""
+    parts: List[str] = []
+    prev = 0
+    for m in _SENT_RE.finditer(txt):
+        cut = m.start()
+        if txt[cut] in ".!?":
+            cut += 1  # mantém a pontuação final na frase
+        parts.append(txt[prev:cut])
+        prev = m.end()
+    parts.append(txt[prev:])
+    return parts
+
 
 @dataclass
 class Evidence:
@@ -33,13 +83,21 @@ def _retrieve_evidence(query: str, topk: int = 6, use_hybrid: bool = True, filte
     neo: Driver = cli.neo
     model: Embeddings = cli.model
 
-    # 1) Vetor da consulta
-    qvec = model.encode([query])[0]
+    # 1) Vetor da consulta e candidatos do ES em paralelo (o encode libera o GIL nos
+    #    kernels do torch, então a latência de rede do ES fica escondida atrás dele)
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f_vec = ex.submit(embed_query, model, query)
+        f_es = (
+            ex.submit(es.search, index=cli.es_index, query={"match": {"content": query}}, size=max(20, topk * 3), _source=False)
+            if use_hybrid
+            else None
+        )
+        qvec = list(f_vec.result())
+        res = f_es.result() if f_es is not None else None
 
     # 2) Construir filtro do Qdrant (ES candidatos + law_id opcional)
     must_conditions: List[qm.Condition] = []
-    if use_hybrid:
-        res = es.search(index=cli.es_index, query={"match": {"content": query}}, size=max(20, topk * 3), _source=False)
+    if res is not None:
         candidate_doc_ids = [h["_id"] for h in res.get("hits", {}).get("hits", [])]
         if candidate_doc_ids:
             must_conditions.append(qm.FieldCondition(key="doc_id", match=qm.MatchAny(any=candidate_doc_ids)))
@@ -52,42 +110,47 @@ def _retrieve_evidence(query: str, topk: int = 6, use_hybrid: bool = True, filte
     qfilter = qm.Filter(must=must_conditions) if must_conditions else None
 
     # 3) Busca semântica
-    hits = qd.search(collection_name=cli.qd_collection, query_vector=qvec, limit=topk, query_filter=qfilter)
+    hits = qd.search(
+        collection_name=cli.qd_collection,
+        query_vector=qvec,
+        limit=topk,
+        query_filter=qfilter,
+        search_params=QDRANT_SEARCH_PARAMS,
+    )
 
-    # 4) Enriquecer com texto/trilha no Neo4j
+    # 4) Enriquecer com texto/trilha no Neo4j (uma única consulta para todos os hits)
     cypher = (
-        "MATCH (c:Chunk {id: $cid})\n"
+        "UNWIND $cids AS cid\n"
+        "MATCH (c:Chunk {id: cid})\n"
         "OPTIONAL MATCH (l:Law)-[:HAS_CHUNK]->(c)\n"
         "OPTIONAL MATCH (a:Article)-[:HAS_CHUNK]->(c)\n"
         "OPTIONAL MATCH (p:Paragraph)-[:HAS_CHUNK]->(c)\n"
         "OPTIONAL MATCH (i:Inciso)-[:HAS_CHUNK]->(c)\n"
-        "RETURN c.text as text, l.id as law, a.id as article, p.id as paragraph, i.id as inciso"
+        "RETURN cid, c.text as text, l.id as law, a.id as article, p.id as paragraph, i.id as inciso"
     )
+    cids = [(h.payload or {}).get("chunk_id") for h in hits]
+    rows: Dict[str, Dict[str, Any]] = {}
+    if any(cids):
+        with neo.session() as sess:
+            for row in sess.run(cypher, cids=[c for c in cids if c]).data():
+                rows.setdefault(row["cid"], row)
+    # mantém a ordem (score) do Qdrant
     evs: List[Evidence] = []
-    with neo.session() as sess:
-        for h in hits:
-            payload = h.payload or {}
-            cid = payload.get("chunk_id")
-            if not cid:
-                continue
-            rec = sess.run(cypher, cid=cid).single()
-            if not rec:
-                continue
-            evs.append(
-                Evidence(
-                    chunk_id=cid,
-                    score=float(h.score or 0.0),
-                    law=rec["law"],  # type: ignore[index]
-                    article=rec["article"],  # type: ignore[index]
-                    paragraph=rec["paragraph"],  # type: ignore[index]
-                    inciso=rec["inciso"],  # type: ignore[index]
-                    text=(rec["text"] or ""),  # type: ignore[index]
-                )
+    for h, cid in zip(hits, cids):
+        rec = rows.get(cid) if cid else None
+        if not rec:
+            continue
+        evs.append(
+            Evidence(
+                chunk_id=cid,
+                score=float(h.score or 0.0),
+                law=rec["law"],
+                article=rec["article"],
+                paragraph=rec["paragraph"],
+                inciso=rec["inciso"],
+                text=(rec["text"] or ""),
             )
-    try:
-        cli.neo.close()
-    except Exception:
-        pass
+        )
     return evs
 
 
@@ -138,22 +201,17 @@ def _build_fallback_answer(query: str, evidences: List[Evidence]) -> str:
         )
 
     # Gera uma resposta extrativa estruturada com base nas evidências
-    keywords = [
-        "infração", "infrações", "penalidade", "penalidades", "sanção", "sanções",
-        "multa", "advertência", "interdição", "suspensão", "cancelamento", "apreensão",
-    ]
     def _sentences(txt: str) -> List[str]:
-        import re
-        # separa por ponto final, quebras de linha e ponto e vírgula
-        raw = re.split(r"(?<=[\.!?])\s+|\n+|;\s+", (txt or "").strip())
+        raw = _split_sentences((txt or "").strip())
         return [s.strip() for s in raw if s and len(s.strip()) > 3]
 
     extracted: List[str] = []
     used_refs: List[int] = []
+    used_refs_set = set()
     for idx, ev in enumerate(evidences[: min(5, len(evidences))], start=1):
         for s in _sentences(ev.text)[:20]:  # limita por evidência
             low = s.lower()
-            if any(k in low for k in keywords):
+            if _has_keyword(low):
                 prefix = []
                 if ev.article:
                     prefix.append(f"{ev.article}")
@@ -163,7 +221,8 @@ def _build_fallback_answer(query: str, evidences: List[Evidence]) -> str:
                     prefix.append(f"Inciso {ev.inciso}")
                 ctx = (" – ".join(prefix) + ": ") if prefix else ""
                 extracted.append(f"- {ctx}{s}")
-                if idx not in used_refs:
+                if idx not in used_refs_set:
+                    used_refs_set.add(idx)
                     used_refs.append(idx)
         if len(extracted) >= 12:
             break
@@ -1,16 +1,23 @@
 from __future__ import annotations
 
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
-from elasticsearch import Elasticsearch
+from elasticsearch import ApiError, Elasticsearch
 from neo4j import GraphDatabase, Driver
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qm
 from .embeddings import Embeddings
+from .stores.elasticsearch_store import es_serializers
 
 from .config import load_settings
 
+# Com a coleção quantizada (INT8), o HNSW gera candidatos com os vetores quantizados e o
+# top-k é reordenado com os vetores float32 originais; sem quantização, é ignorado
+QDRANT_SEARCH_PARAMS = qm.SearchParams(quantization=qm.QuantizationSearchParams(rescore=True))
 
 @dataclass
 class Clients:
@@ -20,18 +27,33 @@ class Clients:
     model: Embeddings
     es_index: str
     qd_collection: str
+    # Índice de chunks com embeddings no ES (busca híbrida em uma requisição); "" = desativado
+    es_chunk_index: str = ""
 
 
+@lru_cache(maxsize=1)
 def bootstrap_clients() -> Clients:
+    """Clientes e modelo de embeddings, criados uma única vez por processo.
+    O driver do Neo4j vive até o fim do processo (fechado via atexit).
+    """
     cfg = load_settings()
-    es = Elasticsearch(cfg.elastic_url)
-    qd = QdrantClient(url=cfg.qdrant_url)
+    es = Elasticsearch(cfg.elastic_url, serializers=es_serializers())
+    # Mesmo transporte da ingestão: gRPC (protobuf binário) quando QDRANT_PREFER_GRPC
+    qd = QdrantClient(
+        url=cfg.qdrant_url,
+        timeout=cfg.qdrant_timeout,
+        prefer_grpc=cfg.qdrant_prefer_grpc,
+        grpc_port=cfg.qdrant_grpc_port,
+    )
     neo = GraphDatabase.driver(cfg.neo4j_url, auth=(cfg.neo4j_user, cfg.neo4j_password))
+    atexit.register(neo.close)
     model = Embeddings(
         cfg.embedding_model,
         hf_token=cfg.hf_token,
         local_files_only=cfg.hf_local_files_only,
         force_backend=cfg.emb_force_backend,
+        compile_model=cfg.emb_torch_compile,
+        jit_cache_dir=cfg.emb_jit_cache_dir or None,
     )
     return Clients(
         es=es,
@@ -40,9 +62,18 @@ def bootstrap_clients() -> Clients:
         model=model,
         es_index=cfg.elastic_index,
         qd_collection=cfg.qdrant_collection,
+        es_chunk_index=cfg.elastic_chunk_index,
     )
 
 
+@lru_cache(maxsize=1024)
+def embed_query(model: Embeddings, query: str) -> Tuple[float, ...]:
+    """Embedding da consulta com cache (consultas repetidas não refazem o forward).
+    Tupla imutável: use `list(...)` ao passar para os clientes (o Qdrant trata tuplas como vetor nomeado).
+    """
+    return tuple(model.encode([query])[0].tolist())
+
+
 def search_lexical_es(cli: Clients, query: str, size: int = 5):
     res = cli.es.search(
         index=cli.es_index,
@@ -65,8 +96,10 @@ def search_semantic_qdrant(
     query: str,
     limit: int = 5,
     filter_doc_ids: Optional[List[str]] = None,
+    vec=None,
 ):
-    vec = cli.model.encode([query])[0]
+    if vec is None:
+        vec = list(embed_query(cli.model, query))
     qfilter = None
     if filter_doc_ids:
         qfilter = qm.Filter(must=[qm.FieldCondition(key="doc_id", match=qm.MatchAny(any=filter_doc_ids))])
@@ -76,21 +109,74 @@ def search_semantic_qdrant(
         query_vector=vec,
         limit=limit,
         query_filter=qfilter,
+        search_params=QDRANT_SEARCH_PARAMS,
     )
     print(f"[Qdrant] {len(results)} resultados para: '{query}'")
+    _print_points(results)
+    return results
+
+
+def _print_points(results: List[qm.ScoredPoint]):
     for r in results:
         p = r.payload or {}
         print(
             f"- score={r.score:.4f} law={p.get('law_id')} art={p.get('article')} par={p.get('paragraph')} inc={p.get('inciso')} chunk_id={p.get('chunk_id')}"
         )
+
+
+def _rrf_unsupported(e: ApiError) -> bool:
+    """Erro do ES por falta de suporte ao `rank` RRF: 400 de versão sem o parâmetro ou 403 de
+    licença. Outros erros (índice inexistente, mapping/dimensão, autenticação, 5xx) não são."""
+    if e.meta.status not in (400, 403):
+        return False
+    detail = f"{e.message} {e.body}".lower()
+    return any(k in detail for k in ("rank", "rrf", "license"))
+
+
+def hybrid_search_es(cli: Clients, query: str, limit: int = 5, num_candidates: int = 100) -> List[qm.ScoredPoint]:
+    """Busca híbrida em uma única requisição ao índice de chunks do ES: kNN no embedding +
+    BM25 no texto, fundidos por RRF. Sem RRF (licença/versão do ES), o ES soma os scores.
+    Os hits voltam como `ScoredPoint`, no mesmo formato da busca no Qdrant.
+    """
+    vec = list(embed_query(cli.model, query))
+    kwargs = dict(
+        index=cli.es_chunk_index,
+        knn={"field": "embedding", "query_vector": vec, "k": limit, "num_candidates": max(num_candidates, limit)},
+        query={"match": {"text": query}},
+        size=limit,
+        source_excludes=["embedding"],
+    )
+    try:
+        res = cli.es.search(**kwargs, rank={"rrf": {}})
+    except ApiError as e:
+        if not _rrf_unsupported(e):
+            raise
+        print(f"[Hybrid/ES] RRF indisponível ({e.meta.status}); usando a soma dos scores kNN + BM25.")
+        res = cli.es.search(**kwargs)
+    results = []
+    for h in res.get("hits", {}).get("hits", []):
+        score = h.get("_score")
+        if score is None:  # RRF informa a posição (_rank) em vez de score
+            score = 1.0 / (60 + int(h.get("_rank") or 0))
+        results.append(qm.ScoredPoint(id=h["_id"], version=0, score=float(score), payload=h.get("_source") or {}))
+    print(f"[Hybrid/ES] {len(results)} resultados para: '{query}'")
+    _print_points(results)
     return results
 
 
 def hybrid_search(cli: Clients, query: str, es_size: int = 10, qdrant_limit: int = 5):
-    res = cli.es.search(index=cli.es_index, query={"match": {"content": query}}, size=es_size, _source=False)
+    if cli.es_chunk_index:
+        # Embeddings indexados no ES: uma requisição, sem o join ES → Qdrant
+        return hybrid_search_es(cli, query, limit=qdrant_limit)
+    # BM25 no ES e embedding da consulta em paralelo (rede x CPU/GPU)
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f_es = ex.submit(cli.es.search, index=cli.es_index, query={"match": {"content": query}}, size=es_size, _source=False)
+        f_vec = ex.submit(embed_query, cli.model, query)
+        res = f_es.result()
+        vec = list(f_vec.result())
     candidate_doc_ids = [h["_id"] for h in res.get("hits", {}).get("hits", [])]
     print("[Hybrid] Doc IDs candidatos (ES):", candidate_doc_ids or "(nenhum)")
-    hits = search_semantic_qdrant(cli, query, limit=qdrant_limit, filter_doc_ids=candidate_doc_ids or None)
+    hits = search_semantic_qdrant(cli, query, limit=qdrant_limit, filter_doc_ids=candidate_doc_ids or None, vec=vec)
     return hits
 
 
@@ -131,34 +217,28 @@ def explain_chunk(cli: Clients, chunk_id: str, neighbors: bool = True):
 
 def run_search(mode: str, query: str, size: int = 5, limit: int = 5, explain: bool = True):
     cli = bootstrap_clients()
-    try:
-        mode = (mode or "all").lower()
-        best_hit = None
-
-        if mode in ("lexical", "all"):
-            print("\n=== Busca lexical (Elasticsearch) ===")
-            search_lexical_es(cli, query, size=size)
-
-        if mode in ("semantic", "all"):
-            print("\n=== Busca semântica (Qdrant) ===")
-            hits = search_semantic_qdrant(cli, query, limit=limit)
-            best_hit = best_hit or (hits[0] if hits else None)
-
-        if mode in ("hybrid", "all"):
-            print("\n=== Busca híbrida (ES → Qdrant) ===")
-            hits = hybrid_search(cli, query, es_size=size, qdrant_limit=limit)
-            best_hit = best_hit or (hits[0] if hits else None)
-
-        if explain and best_hit is not None:
-            payload = best_hit.payload or {}
-            cid = payload.get("chunk_id")
-            if cid:
-                print("\n=== Contexto no grafo (Neo4j) ===")
-                explain_chunk(cli, cid, neighbors=True)
-            else:
-                print("\n[Info] Resultado sem chunk_id no payload para explicar no grafo.")
-    finally:
-        try:
-            cli.neo.close()
-        except Exception:
-            pass
+    mode = (mode or "all").lower()
+    best_hit = None
+
+    if mode in ("lexical", "all"):
+        print("\n=== Busca lexical (Elasticsearch) ===")
+        search_lexical_es(cli, query, size=size)
+
+    if mode in ("semantic", "all"):
+        print("\n=== Busca semântica (Qdrant) ===")
+        hits = search_semantic_qdrant(cli, query, limit=limit)
+        best_hit = best_hit or (hits[0] if hits else None)
+
+    if mode in ("hybrid", "all"):
+        print("\n=== Busca híbrida (ES kNN + BM25) ===" if cli.es_chunk_index else "\n=== Busca híbrida (ES → Qdrant) ===")
+        hits = hybrid_search(cli, query, es_size=size, qdrant_limit=limit)
+        best_hit = best_hit or (hits[0] if hits else None)
+
+    if explain and best_hit is not None:
+        payload = best_hit.payload or {}
+        cid = payload.get("chunk_id")
+        if cid:
+            print("\n=== Contexto no grafo (Neo4j) ===")
+            explain_chunk(cli, cid, neighbors=True)
+        else:
+            print("\n[Info] Resultado sem chunk_id no payload para explicar no grafo.")
@@ -1,11 +1,43 @@
-from typing import Dict
-from elasticsearch import Elasticsearch
+from typing import Any, Dict, Iterable, List, Tuple
+from elasticsearch import Elasticsearch, helpers
+from elasticsearch.serializer import JSONSerializer, NdjsonSerializer
+
+try:  # orjson é opcional: sem ele, o client usa o json da stdlib
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class OrjsonSerializer(JSONSerializer):
+    """Serializa corpos JSON com orjson (encoder em C, bem mais rápido em lotes grandes)."""
+
+    def json_dumps(self, data: Any) -> bytes:
+        return orjson.dumps(data, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def json_loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class OrjsonNdjsonSerializer(OrjsonSerializer, NdjsonSerializer):
+    """Variante NDJSON usada pelas requisições _bulk."""
+
+    mimetype = NdjsonSerializer.mimetype
+
+
+def es_serializers() -> Dict[str, JSONSerializer]:
+    """Serializers por mimetype para `Elasticsearch(serializers=...)`; vazio se orjson faltar."""
+    if orjson is None:
+        return {}
+    return {
+        OrjsonSerializer.mimetype: OrjsonSerializer(),
+        OrjsonNdjsonSerializer.mimetype: OrjsonNdjsonSerializer(),
+    }
 
 
 class ElasticsearchStore:
     def __init__(self, url: str, index: str, timeout: float | None = None):
         # O timeout padrão do client é alto; vamos usar timeouts por chamada.
-        self.client = Elasticsearch(url)
+        self.client = Elasticsearch(url, serializers=es_serializers())
         self.index = index
         self.timeout = float(timeout or 15)
 
@@ -24,5 +56,46 @@ class ElasticsearchStore:
                 request_timeout=self.timeout,
             )
 
+    def ensure_chunk_index(self, dims: int):
+        """Índice de chunks para busca híbrida no próprio ES: texto (BM25), campos da trilha
+        legal e o embedding como `dense_vector` (kNN/HNSW, similaridade cosseno).
+        """
+        if not self.client.indices.exists(index=self.index, request_timeout=self.timeout):
+            self.client.indices.create(
+                index=self.index,
+                mappings={
+                    "properties": {
+                        "chunk_id": {"type": "keyword"},
+                        "doc_id": {"type": "keyword"},
+                        "law_id": {"type": "keyword"},
+                        "article": {"type": "keyword"},
+                        "paragraph": {"type": "keyword"},
+                        "inciso": {"type": "keyword"},
+                        "start": {"type": "integer"},
+                        "end": {"type": "integer"},
+                        "text": {"type": "text"},
+                        "embedding": {"type": "dense_vector", "dims": int(dims), "index": True, "similarity": "cosine"},
+                    }
+                },
+                request_timeout=self.timeout,
+            )
+
     def index_document(self, doc_id: str, body: Dict):
         self.client.index(index=self.index, id=doc_id, document=body, refresh=False, request_timeout=self.timeout)
+
+    def bulk_index(self, docs: Iterable[Tuple[str, Dict]], chunk_size: int = 500) -> Tuple[int, List[Dict]]:
+        """Indexa pares (doc_id, corpo) com uma requisição _bulk a cada `chunk_size` documentos.
+        Retorna (nº de sucessos, erros por documento); falhas não interrompem o lote.
+        """
+        actions = (
+            {"_op_type": "index", "_index": self.index, "_id": doc_id, "_source": body}
+            for doc_id, body in docs
+        )
+        return helpers.bulk(
+            self.client,
+            actions,
+            chunk_size=max(1, int(chunk_size)),
+            request_timeout=self.timeout,
+            refresh=False,
+            raise_on_error=False,
+        )
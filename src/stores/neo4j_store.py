@@ -1,7 +1,80 @@
-from typing import Optional
+from typing import Dict, List, Optional
 from neo4j import GraphDatabase
 
 
+# Hierarquia Lei→Artigo→Parágrafo→Inciso de cada linha `r` (níveis ausentes são pulados)
+HIERARCHY_CYPHER = (
+    "MERGE (l:Law {id: r.law_id})\n"
+    "FOREACH (_ IN CASE WHEN r.art_id IS NULL THEN [] ELSE [1] END |\n"
+    "  MERGE (a:Article {id: r.art_id}) SET a.num = r.article\n"
+    "  MERGE (l)-[:HAS_ARTICLE]->(a))\n"
+    "FOREACH (_ IN CASE WHEN r.par_id IS NULL THEN [] ELSE [1] END |\n"
+    "  MERGE (p:Paragraph {id: r.par_id}) SET p.num = r.paragraph\n"
+    "  FOREACH (_a IN CASE WHEN r.art_id IS NULL THEN [] ELSE [1] END |\n"
+    "    MERGE (a:Article {id: r.art_id})\n"
+    "    MERGE (a)-[:HAS_PARAGRAPH]->(p)))\n"
+    "FOREACH (_ IN CASE WHEN r.inc_id IS NULL THEN [] ELSE [1] END |\n"
+    "  MERGE (i:Inciso {id: r.inc_id}) SET i.num = r.inciso\n"
+    "  FOREACH (_p IN CASE WHEN r.par_id IS NULL THEN [] ELSE [1] END |\n"
+    "    MERGE (p:Paragraph {id: r.par_id})\n"
+    "    MERGE (p)-[:HAS_INCISO]->(i)))\n"
+)
+
+# Uma única instrução para um lote de chunks: hierarquia e o vínculo do chunk ao nível
+# mais específico (mesmos ids/relacionamentos de upsert_hierarchy + attach_chunk).
+BULK_UPSERT_CYPHER = (
+    "UNWIND $rows AS r\n"
+    + HIERARCHY_CYPHER
+    + "MERGE (c:Chunk {id: r.chunk_id}) SET c.text = r.text, c.start = r.start, c.end = r.end\n"
+    "FOREACH (_ IN CASE WHEN r.parent_label = 'Law' THEN [1] ELSE [] END |\n"
+    "  MERGE (l)-[:HAS_CHUNK]->(c))\n"
+    "FOREACH (_ IN CASE WHEN r.parent_label = 'Article' THEN [1] ELSE [] END |\n"
+    "  MERGE (a:Article {id: r.parent_id}) MERGE (a)-[:HAS_CHUNK]->(c))\n"
+    "FOREACH (_ IN CASE WHEN r.parent_label = 'Paragraph' THEN [1] ELSE [] END |\n"
+    "  MERGE (p:Paragraph {id: r.parent_id}) MERGE (p)-[:HAS_CHUNK]->(c))\n"
+    "FOREACH (_ IN CASE WHEN r.parent_label = 'Inciso' THEN [1] ELSE [] END |\n"
+    "  MERGE (i:Inciso {id: r.parent_id}) MERGE (i)-[:HAS_CHUNK]->(c))"
+)
+
+
+# Chunk ligado a um pai de rótulo desconhecido: um OPTIONAL MATCH por rótulo usa os
+# índices das constraints de id (um MATCH sem rótulo varreria o grafo inteiro)
+ATTACH_CHUNKS_CYPHER = (
+    "UNWIND $rows AS r\n"
+    "MERGE (c:Chunk {id: r.id}) SET c.text = r.text, c.start = r.start, c.end = r.end\n"
+    "WITH c, r\n"
+    "OPTIONAL MATCH (l:Law {id: r.parent})\n"
+    "OPTIONAL MATCH (a:Article {id: r.parent})\n"
+    "OPTIONAL MATCH (p:Paragraph {id: r.parent})\n"
+    "OPTIONAL MATCH (i:Inciso {id: r.parent})\n"
+    "FOREACH (_ IN CASE WHEN l IS NOT NULL THEN [1] ELSE [] END | MERGE (l)-[:HAS_CHUNK]->(c))\n"
+    "FOREACH (_ IN CASE WHEN a IS NOT NULL THEN [1] ELSE [] END | MERGE (a)-[:HAS_CHUNK]->(c))\n"
+    "FOREACH (_ IN CASE WHEN p IS NOT NULL THEN [1] ELSE [] END | MERGE (p)-[:HAS_CHUNK]->(c))\n"
+    "FOREACH (_ IN CASE WHEN i IS NOT NULL THEN [1] ELSE [] END | MERGE (i)-[:HAS_CHUNK]->(c))"
+)
+
+
+def _hierarchy_ids(law_id: str, article: Optional[str], paragraph: Optional[str], inciso: Optional[str]) -> Dict[str, Optional[str]]:
+    """Ids dos nós da trilha legal e o nó mais específico (pai do chunk)."""
+    art_id = f"{law_id}:Art{article}" if article else None
+    par_id = f"{law_id}:{article or ''}:Par{paragraph}" if paragraph else None
+    inc_id = f"{law_id}:{article or ''}:{paragraph or ''}:Inc{inciso}" if inciso else None
+    parent_label, parent_id = "Law", law_id
+    if art_id:
+        parent_label, parent_id = "Article", art_id
+    if par_id:
+        parent_label, parent_id = "Paragraph", par_id
+    if inc_id:
+        parent_label, parent_id = "Inciso", inc_id
+    return {
+        "art_id": art_id,
+        "par_id": par_id,
+        "inc_id": inc_id,
+        "parent_label": parent_label,
+        "parent_id": parent_id,
+    }
+
+
 class Neo4jStore:
     def __init__(self, uri: str, user: str, password: str, timeout: float | None = None):
         drv_kwargs = {"auth": (user, password)}
@@ -41,72 +114,35 @@ class Neo4jStore:
             return False
 
     def upsert_hierarchy(self, law_id: str, article: Optional[str], paragraph: Optional[str], inciso: Optional[str]):
+        """Cria a trilha legal em uma única transação e retorna (rótulo, id) do nível mais específico."""
+        row = {"law_id": law_id, "article": article, "paragraph": paragraph, "inciso": inciso}
+        row.update(_hierarchy_ids(law_id, article, paragraph, inciso))
         with self.driver.session() as sess:
-            sess.execute_write(
-                lambda tx: tx.run(
-                    "MERGE (l:Law {id: $law_id}) RETURN l", law_id=law_id
-                )
-            )
-            last_label = "Law"
-            last_id = law_id
-            if article:
-                art_id = f"{law_id}:Art{article}"
-                with self.driver.session() as s2:
-                    s2.execute_write(
-                        lambda tx: tx.run(
-                            "MERGE (a:Article {id: $id, num: $num})\n"
-                            "WITH a\n"
-                            "MATCH (l:Law {id: $law})\n"
-                            "MERGE (l)-[:HAS_ARTICLE]->(a)",
-                            id=art_id, num=article, law=law_id,
-                        )
-                    )
-                last_label = "Article"
-                last_id = art_id
-            if paragraph:
-                par_id = f"{law_id}:{article or ''}:Par{paragraph}"
-                with self.driver.session() as s3:
-                    s3.execute_write(
-                        lambda tx: tx.run(
-                            "MERGE (p:Paragraph {id: $id, num: $num})\n"
-                            "WITH p\n"
-                            "MATCH (a:Article {id: $art})\n"
-                            "MERGE (a)-[:HAS_PARAGRAPH]->(p)",
-                            id=par_id, num=paragraph, art=f"{law_id}:Art{article}" if article else None,
-                        )
-                    )
-                last_label = "Paragraph"
-                last_id = par_id
-            if inciso:
-                inc_id = f"{law_id}:{article or ''}:{paragraph or ''}:Inc{inciso}"
-                with self.driver.session() as s4:
-                    s4.execute_write(
-                        lambda tx: tx.run(
-                            "MERGE (i:Inciso {id: $id, num: $num})\n"
-                            "WITH i\n"
-                            "MATCH (p:Paragraph {id: $par})\n"
-                            "MERGE (p)-[:HAS_INCISO]->(i)",
-                            id=inc_id, num=inciso, par=f"{law_id}:{article or ''}:Par{paragraph}" if paragraph else None,
-                        )
-                    )
-                last_label = "Inciso"
-                last_id = inc_id
-            return last_label, last_id
+            sess.execute_write(lambda tx: tx.run("UNWIND $rows AS r\n" + HIERARCHY_CYPHER, rows=[row]).consume())
+        return row["parent_label"], row["parent_id"]
 
     def attach_chunk(self, parent_id: str, chunk_id: str, text: str, start_char: int, end_char: int):
+        self.attach_chunks([{"parent": parent_id, "id": chunk_id, "text": text, "start": start_char, "end": end_char}])
+
+    def attach_chunks(self, rows: List[Dict]):
+        """Vincula um lote de chunks aos seus nós pais em uma única transação (UNWIND).
+        Cada linha deve conter: parent, id, text, start, end.
+        """
+        if not rows:
+            return
         with self.driver.session() as sess:
-            sess.execute_write(
-                lambda tx: tx.run(
-                    "MERGE (c:Chunk {id: $id}) SET c.text=$text, c.start=$start, c.end=$end\n"
-                    "WITH c\n"
-                    "OPTIONAL MATCH (l:Law {id: $parent})\n"
-                    "OPTIONAL MATCH (a:Article {id: $parent})\n"
-                    "OPTIONAL MATCH (p:Paragraph {id: $parent})\n"
-                    "OPTIONAL MATCH (i:Inciso {id: $parent})\n"
-                    "FOREACH (_ IN CASE WHEN l IS NOT NULL THEN [1] ELSE [] END | MERGE (l)-[:HAS_CHUNK]->(c))\n"
-                    "FOREACH (_ IN CASE WHEN a IS NOT NULL THEN [1] ELSE [] END | MERGE (a)-[:HAS_CHUNK]->(c))\n"
-                    "FOREACH (_ IN CASE WHEN p IS NOT NULL THEN [1] ELSE [] END | MERGE (p)-[:HAS_CHUNK]->(c))\n"
-                    "FOREACH (_ IN CASE WHEN i IS NOT NULL THEN [1] ELSE [] END | MERGE (i)-[:HAS_CHUNK]->(c))",
-                    id=chunk_id, text=text, start=start_char, end=end_char, parent=parent_id,
-                )
-            )
+            sess.execute_write(lambda tx: tx.run(ATTACH_CHUNKS_CYPHER, rows=rows).consume())
+
+    def bulk_upsert(self, rows: List[Dict]):
+        """Grava um lote de chunks com sua hierarquia legal em uma única transação (UNWIND).
+        Cada linha deve conter: law_id, article, paragraph, inciso, chunk_id, text, start, end.
+        """
+        if not rows:
+            return
+        params = []
+        for r in rows:
+            p = dict(r)
+            p.update(_hierarchy_ids(r["law_id"], r.get("article"), r.get("paragraph"), r.get("inciso")))
+            params.append(p)
+        with self.driver.session() as sess:
+            sess.execute_write(lambda tx: tx.run(BULK_UPSERT_CYPHER, rows=params).consume())
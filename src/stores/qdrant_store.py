@@ -1,11 +1,73 @@
-from typing import List, Dict, Optional, Union
+from typing import Iterable, List, Dict, Optional, Tuple, Union
+import hashlib
+import json
+import random
+import threading
 import uuid
 import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import grpc
+import httpx
+import numpy as np
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qm
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+# Falhas transitórias (rede, timeout, sobrecarga) que justificam nova tentativa
+_RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+_RETRY_GRPC_CODES = frozenset(
+    {grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.RESOURCE_EXHAUSTED}
+)
+
+
+def _is_retryable(e: Exception) -> bool:
+    """Erros de transporte/timeout e respostas 429/5xx; erros determinísticos (dimensão de
+    vetor inválida, autenticação, 4xx em geral) sobem imediatamente, sem esperar o backoff.
+    """
+    if isinstance(e, (httpx.TransportError, ResponseHandlingException)):
+        return True
+    if isinstance(e, UnexpectedResponse):
+        return e.status_code in _RETRY_STATUS
+    if isinstance(e, grpc.RpcError):
+        # Só erros que também são grpc.Call expõem code(); um RpcError "nu" não é retentado
+        code = getattr(e, "code", None)
+        return callable(code) and code() in _RETRY_GRPC_CODES
+    return False
+
+
+# Clientes compartilhados entre instâncias de QdrantStore com a mesma configuração de
+# conexão (várias coleções/pipelines no mesmo processo reaproveitam o pool httpx/canal gRPC).
+# O QdrantClient pode ser usado por várias threads ao mesmo tempo, mas é compartilhado:
+# não chame `client.close()` em um store enquanto outros ainda o usam.
+_CLIENT_CACHE: Dict[Tuple, QdrantClient] = {}
+_CLIENT_LOCK = threading.Lock()
+
+
+def _shared_client(url: str, timeout: float, prefer_grpc: bool, grpc_port: int, max_connections: int) -> QdrantClient:
+    key = (url, timeout, prefer_grpc, grpc_port, max_connections)
+    with _CLIENT_LOCK:
+        client = _CLIENT_CACHE.get(key)
+        if client is None:
+            # Pool httpx do REST dimensionado para os upserts paralelos, com keep-alive (o
+            # padrão do cliente desliga o keep-alive em localhost e abre uma conexão por requisição)
+            client = QdrantClient(
+                url=url,
+                timeout=timeout,
+                prefer_grpc=prefer_grpc,
+                grpc_port=grpc_port,
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            )
+            _CLIENT_CACHE[key] = client
+        return client
 
 
 class QdrantStore:
+    # Campos de payload usados nos filtros de busca (MatchAny em doc_id, law_id no RAG)
+    PAYLOAD_INDEXES = ("doc_id", "law_id")
+    # Orçamento por requisição de upsert, com folga abaixo do limite de 32 MiB do Qdrant
+    UPSERT_TARGET_BYTES = 24 * 1024 * 1024
+
     def __init__(
         self,
         url: str,
@@ -14,28 +76,54 @@ class QdrantStore:
         upsert_batch: int | None = None,
         timeout: float | None = None,
         retries: int | None = None,
+        prefer_grpc: bool = False,
+        grpc_port: int = 6334,
+        quantization: bool = False,
+        parallelism: int | None = None,
+        max_connections: int | None = None,
     ):
         # Timeout HTTP para requests ao Qdrant (segundos)
         timeout_val = float(timeout) if timeout is not None else 120.0
-        self.client = QdrantClient(url=url, timeout=timeout_val)
+        # Com prefer_grpc, upserts/buscas trafegam em protobuf binário (porta gRPC); o REST continua disponível
+        conns = max(1, int(max_connections or 100))
+        self.client = _shared_client(url, timeout_val, bool(prefer_grpc), int(grpc_port), conns)
+        self.prefer_grpc = bool(prefer_grpc)
+        # Coleção já conferida/criada neste processo (ensure_collection vira no-op)
+        self._ensured = False
         self.collection = collection
+        # Namespace dos UUIDv5 dos pontos: depende só da coleção, calculado uma vez
+        self._ns = uuid.uuid5(uuid.NAMESPACE_URL, f"qdrant:{collection}")
         self.vector_size = vector_size
         # Tamanho do lote para dividir requisições e evitar limite de 32 MiB do Qdrant HTTP
         self.upsert_batch = int(upsert_batch or 256)
         self.retries = int(retries or 3)
+        # Threads que enviam lotes de upsert simultaneamente (a E/S de rede libera o GIL)
+        self.parallelism = max(1, int(parallelism or 4))
+        # Quantização escalar INT8 (1 byte/dimensão) mantida em RAM para o HNSW; os vetores
+        # float32 originais continuam armazenados e são usados no rescore das buscas
+        self.quantization: Optional[qm.ScalarQuantization] = (
+            qm.ScalarQuantization(
+                scalar=qm.ScalarQuantizationConfig(type=qm.ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+            if quantization
+            else None
+        )
 
-    # --- utilitários de retry simples com backoff exponencial ---
+    # --- utilitários de retry simples com backoff exponencial (com jitter) ---
     def _with_retries(self, func, *args, **kwargs):
         delay = 1.0
         last_exc: Optional[Exception] = None
         for attempt in range(1, self.retries + 1):
             try:
                 return func(*args, **kwargs)
-            except Exception as e:  # inclui ReadTimeout/ResponseHandlingException
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
                 last_exc = e
                 if attempt == self.retries:
                     break
-                time.sleep(delay)
+                # Jitter de ±50% para que pipelines paralelos não repitam todos no mesmo instante
+                time.sleep(delay * (0.5 + random.random()))
                 delay = min(delay * 2.0, 8.0)
         if last_exc:
             raise last_exc
@@ -45,83 +133,211 @@ class QdrantStore:
         """Garante a coleção com o tamanho de vetor correto.
         - Se não existir: cria (create_collection).
         - Se existir com tamanho diferente: recria (recreate_collection).
+        - Cria índices keyword para os campos de payload filtrados (PAYLOAD_INDEXES).
+        Depois da primeira chamada bem-sucedida não consulta mais o servidor; use
+        `invalidate_ensured()` para forçar nova verificação.
         """
-        try:
-            info = self._with_retries(self.client.get_collection, self.collection)
-            # Extrai tamanho atual
-            current_size = None
-            vc = getattr(info, "vectors_config", None)
-            try:
-                if vc is not None:
-                    if hasattr(vc, "size"):
-                        current_size = int(getattr(vc, "size"))
-                    elif isinstance(vc, dict):
-                        for v in vc.values():
-                            if hasattr(v, "size"):
-                                current_size = int(getattr(v, "size"))
-                                break
-            except Exception:
-                current_size = None
-            if current_size is None:
-                try:
-                    cfg = getattr(info, "config", None)
-                    params = getattr(cfg, "params", None)
-                    vectors = getattr(params, "vectors", None)
-                    if hasattr(vectors, "size"):
-                        current_size = int(getattr(vectors, "size"))
-                except Exception:
-                    current_size = None
-
-            # Se já está com o tamanho certo, nada a fazer
-            if current_size == int(self.vector_size):
-                return
-
-            # Tamanho diferente: recria
+        if self._ensured:
+            return
+        self._ensure_vectors()
+        self._ensure_payload_indexes()
+        self._ensured = True
+
+    def invalidate_ensured(self):
+        """Faz o próximo `ensure_collection` consultar o Qdrant de novo (ex.: coleção apagada externamente)."""
+        self._ensured = False
+
+    def _ensure_payload_indexes(self):
+        # Idempotente: recriar um índice existente com o mesmo schema não tem efeito
+        for field in self.PAYLOAD_INDEXES:
             self._with_retries(
-                self.client.recreate_collection,
+                self.client.create_payload_index,
                 collection_name=self.collection,
-                vectors_config=qm.VectorParams(size=self.vector_size, distance=qm.Distance.COSINE),
+                field_name=field,
+                field_schema=qm.PayloadSchemaType.KEYWORD,
+                wait=True,
             )
-            return
-        except Exception:
+
+    def _ensure_vectors(self):
+        vectors_config = qm.VectorParams(size=self.vector_size, distance=qm.Distance.COSINE)
+        if not self._with_retries(self.client.collection_exists, self.collection):
             # Coleção não existe: cria do zero (evita tentativa de delete)
             self._with_retries(
                 self.client.create_collection,
                 collection_name=self.collection,
-                vectors_config=qm.VectorParams(size=self.vector_size, distance=qm.Distance.COSINE),
+                vectors_config=vectors_config,
+                quantization_config=self.quantization,
             )
+            return
 
-    def _to_point_id(self, raw_id: str) -> Union[int, str]:
-        """Qdrant aceita IDs inteiros ou UUID. Convertemos determinísticamente strings para UUIDv5.
-        Mantemos inteiros quando possível.
-        """
-        # Se for inteiro em string, mantém como int
-        if isinstance(raw_id, str) and raw_id.isdigit():
+        info = self._with_retries(self.client.get_collection, self.collection)
+        # Extrai tamanho atual
+        current_size = None
+        vc = getattr(info, "vectors_config", None)
+        try:
+            if vc is not None:
+                if hasattr(vc, "size"):
+                    current_size = int(getattr(vc, "size"))
+                elif isinstance(vc, dict):
+                    for v in vc.values():
+                        if hasattr(v, "size"):
+                            current_size = int(getattr(v, "size"))
+                            break
+        except Exception:
+            current_size = None
+        if current_size is None:
             try:
-                return int(raw_id)
-            except ValueError:
-                pass
-        # Caso contrário, gera UUIDv5 determinístico baseado no collection name + raw_id
-        namespace = uuid.uuid5(uuid.NAMESPACE_URL, f"qdrant:{self.collection}")
-        return str(uuid.uuid5(namespace, raw_id))
-
-    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: Optional[List[Dict]] = None):
-        # Constrói todos os pontos primeiro
-        all_points: List[qm.PointStruct] = []
+                cfg = getattr(info, "config", None)
+                params = getattr(cfg, "params", None)
+                vectors = getattr(params, "vectors", None)
+                if hasattr(vectors, "size"):
+                    current_size = int(getattr(vectors, "size"))
+            except Exception:
+                current_size = None
+
+        # Se já está com o tamanho certo, só habilita a quantização se ainda faltar
+        if current_size == int(self.vector_size):
+            current_quant = getattr(getattr(info, "config", None), "quantization_config", None)
+            if self.quantization is not None and current_quant is None:
+                self._with_retries(
+                    self.client.update_collection,
+                    collection_name=self.collection,
+                    quantization_config=self.quantization,
+                )
+            return
+
+        # Tamanho diferente: recria
+        self._with_retries(
+            self.client.recreate_collection,
+            collection_name=self.collection,
+            vectors_config=vectors_config,
+            quantization_config=self.quantization,
+        )
+
+    def _ids_to_point_ids(self, raw_ids: List[str]) -> List[Union[int, str]]:
+        """Ids de ponto do Qdrant, que aceita inteiros ou UUID. Strings numéricas viram int
+        (isdecimal() aceita exatamente o que int() converte); as demais viram um UUIDv5
+        determinístico no namespace da coleção, equivalente a `uuid.uuid5(self._ns, raw_id)`:
+        sha1(namespace || nome) com os bits de versão/variante ajustados, calculado direto
+        com hashlib e formatado a partir do hex, sem criar um objeto uuid.UUID por ponto.
+        """
+        ns = self._ns.bytes
+        sha1 = hashlib.sha1
+        out: List = [None] * len(raw_ids)
+        for i, raw_id in enumerate(raw_ids):
+            if raw_id.isdecimal():
+                out[i] = int(raw_id)
+                continue
+            h = bytearray(sha1(ns + raw_id.encode("utf-8")).digest()[:16])
+            h[6] = (h[6] & 0x0F) | 0x50
+            h[8] = (h[8] & 0x3F) | 0x80
+            x = h.hex()
+            out[i] = f"{x[:8]}-{x[8:12]}-{x[12:16]}-{x[16:20]}-{x[20:]}"
+        return out
+
+    def _payload_for(self, raw_id: str, payloads: Optional[List[Dict]], i: int) -> Dict:
+        payload = payloads[i] if payloads and payloads[i] is not None else {}
+        # Preserva o ID original no payload para rastreabilidade. O dict do chamador só é
+        # copiado quando precisa ser alterado; se já traz chunk_id, segue sem cópia
+        if "chunk_id" not in payload:
+            payload = dict(payload)
+            payload["chunk_id"] = raw_id
+        return payload
+
+    def _columns(self, ids: List[str], payloads: Optional[List[Dict]]) -> Tuple[List[Union[int, str]], List[Dict]]:
+        """Ids do Qdrant (calculados por lote) e payloads, em listas pré-alocadas."""
+        qids = self._ids_to_point_ids(ids)
+        pls: List = [None] * len(ids)
+        payload_for = self._payload_for
         for i, raw_id in enumerate(ids):
-            qid = self._to_point_id(raw_id)
-            payload: Optional[Dict] = None
-            if payloads:
-                payload = dict(payloads[i]) if payloads[i] is not None else {}
-            else:
-                payload = {}
-            # Preserva o ID original no payload para rastreabilidade
-            if "chunk_id" not in payload:
-                payload["chunk_id"] = raw_id
-            all_points.append(qm.PointStruct(id=qid, vector=vectors[i], payload=payload))
-
-        # Envia em lotes para respeitar limites de tamanho de payload do Qdrant
-        bsz = max(1, int(self.upsert_batch))
-        for start in range(0, len(all_points), bsz):
-            batch = all_points[start:start + bsz]
-            self._with_retries(self.client.upsert, collection_name=self.collection, points=batch, wait=True)
+            pls[i] = payload_for(raw_id, payloads, i)
+        return qids, pls
+
+    def _batch_size(self, sample_payload: Optional[Dict]) -> int:
+        """Pontos por lote de upsert: `upsert_batch`, limitado para que o corpo estimado da
+        requisição caiba em `UPSERT_TARGET_BYTES`. Cada float ocupa 4 bytes no protobuf do
+        gRPC, mas até ~20 caracteres no JSON do REST; o payload é estimado por uma amostra.
+        """
+        per_float = 4 if self.prefer_grpc else 20
+        payload_bytes = len(json.dumps(sample_payload, default=str)) if sample_payload else 0
+        bytes_per_point = per_float * self.vector_size + payload_bytes + 64
+        return max(1, min(int(self.upsert_batch), self.UPSERT_TARGET_BYTES // bytes_per_point))
+
+    def upsert(
+        self,
+        ids: List[str],
+        vectors: Union[List[List[float]], np.ndarray],
+        payloads: Optional[List[Dict]] = None,
+        wait: bool = True,
+    ):
+        """Upsert em lotes. Com `wait=True` (padrão) retorna só quando todos os pontos estão
+        indexados; com `wait=False` retorna assim que o Qdrant registra os lotes, para
+        pipelines que sobrepõem o envio ao preparo do próximo lote (a durabilidade fica
+        garantida pelo próximo upsert com `wait=True`, já que o Qdrant aplica em ordem).
+        """
+        # Colunas (ids, payloads) montadas só para o lote em envio, então o pico de memória
+        # é de um lote por thread; cada lote vira um único qm.Batch em vez de um PointStruct
+        # validado pelo pydantic por ponto. Métodos/atributos resolvidos uma vez, fora do laço
+        upsert = self.client.upsert
+        collection = self.collection
+        columns = self._columns
+        retries = self._with_retries
+
+        def _send(start: int, wait: bool):
+            end = start + bsz
+            qids, pls = columns(ids[start:end], payloads[start:end] if payloads else None)
+            vecs = vectors[start:end]
+            if isinstance(vecs, np.ndarray):
+                vecs = vecs.tolist()
+            batch = qm.Batch(ids=qids, vectors=vecs, payloads=pls)
+            retries(upsert, collection_name=collection, points=batch, wait=wait)
+
+        if not ids:
+            return
+        # Fatias de um array float32 contíguo são views (sem cópia); o pydantic do qm.Batch
+        # converteria o ndarray para listas de qualquer forma, e vecs.tolist() por fatia faz
+        # essa conversão em C, ~3x mais rápido que entregar o array ao modelo
+        if isinstance(vectors, np.ndarray):
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+        # Envia em lotes para respeitar limites de tamanho de payload do Qdrant, em paralelo e
+        # sem aguardar a indexação (wait=False: retornam quando o Qdrant registra a operação).
+        # Com wait=True, o último lote só vai depois que todos os outros foram confirmados: o
+        # Qdrant aplica as operações na ordem do registro, então ele só retorna com tudo indexado.
+        bsz = self._batch_size(self._payload_for(ids[0], payloads, 0))
+        starts = list(range(0, len(ids), bsz))
+        head, last = (starts[:-1], starts[-1]) if wait else (starts, None)
+        if len(head) > 1 and self.parallelism > 1:
+            with ThreadPoolExecutor(max_workers=min(self.parallelism, len(head))) as ex:
+                # result() propaga a primeira falha (após os retries)
+                for fut in [ex.submit(_send, start, False) for start in head]:
+                    fut.result()
+        else:
+            for start in head:
+                _send(start, False)
+        if last is not None:
+            _send(last, True)
+
+    def upsert_iter(
+        self,
+        points: Iterable[Tuple[str, Union[List[float], np.ndarray], Optional[Dict]]],
+        wait: bool = True,
+    ):
+        """`upsert` a partir de um iterador de pontos (id, vetor, payload), ex.: um gerador de
+        chunks/embeddings, sem montar as listas completas: consome `upsert_batch * parallelism`
+        pontos por vez, o suficiente para ocupar todas as threads de envio. As janelas
+        intermediárias vão com wait=False; só a última usa `wait`, servindo de barreira.
+        """
+        window = max(1, int(self.upsert_batch)) * self.parallelism
+        rows = iter(points)
+
+        def _send(chunk: List[Tuple], wait: bool):
+            ids, vectors, payloads = zip(*chunk)
+            self.upsert(list(ids), np.asarray(vectors, dtype=np.float32), list(payloads), wait=wait)
+
+        # Uma janela de antecipação para saber qual é a última
+        prev = list(islice(rows, window))
+        while prev:
+            chunk = list(islice(rows, window))
+            _send(prev, wait if not chunk else False)
+            prev = chunk
@@ -0,0 +1,18 @@
+"""Regressões do parser de HTML (src/parsers.py)."""
+import pytest
+
+from src.parsers import parse_document, _read_html
+
+
+@pytest.mark.parametrize("content", [b"", b"  \n\t ", b"<!-- so um comentario -->"])
+def test_read_html_empty_document(tmp_path, content):
+    path = tmp_path / "vazio.html"
+    path.write_bytes(content)
+    assert _read_html(str(path)) == ""
+
+
+def test_parse_document_empty_file(tmp_path):
+    path = tmp_path / "vazio.html"
+    path.write_bytes(b"")
+    doc = parse_document(str(path))
+    assert doc is not None and doc.content == ""
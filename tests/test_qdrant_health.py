@@ -0,0 +1,67 @@
+"""Healthcheck do Qdrant via API REST (pytest).
+
+Substitui test_qdrant.py e test_qdrant_direct.py: um único httpx.Client por módulo, com
+keep-alive (e HTTP/2 quando o pacote `h2` está instalado), reaproveitado por todas as
+chamadas. Os testes são pulados quando o Qdrant não está acessível.
+
+    QDRANT_URL=http://127.0.0.1:6333 pytest tests/test_qdrant_health.py
+"""
+import importlib.util
+import os
+
+import httpx
+import pytest
+
+QDRANT_URL = os.getenv("QDRANT_URL", "http://127.0.0.1:6333").rstrip("/")
+# Coleção dedicada ao healthcheck, criada e apagada pelos próprios testes
+COLLECTION = os.getenv("QDRANT_HEALTH_COLLECTION", "healthcheck")
+VECTOR_SIZE = 768  # legal-bert-pt-br
+
+
+@pytest.fixture(scope="module")
+def client():
+    http2 = importlib.util.find_spec("h2") is not None
+    c = httpx.Client(
+        base_url=QDRANT_URL,
+        http2=http2,
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=10),
+    )
+    try:
+        c.get("/collections")
+    except httpx.TransportError as e:
+        c.close()
+        pytest.skip(f"Qdrant indisponível em {QDRANT_URL}: {e}")
+    yield c
+    c.close()
+
+
+@pytest.fixture(scope="module")
+def collection(client):
+    # Remove sobra de uma execução interrompida (que poderia ter outra dimensão)
+    client.delete(f"/collections/{COLLECTION}")
+    r = client.put(
+        f"/collections/{COLLECTION}",
+        json={"vectors": {"size": VECTOR_SIZE, "distance": "Cosine"}},
+    )
+    assert r.status_code == 200, r.text
+    yield COLLECTION
+    client.delete(f"/collections/{COLLECTION}")
+
+
+def test_list_collections(client):
+    r = client.get("/collections")
+    assert r.status_code == 200, r.text
+    assert "collections" in r.json()["result"]
+
+
+def test_collection_listed(client, collection):
+    r = client.get("/collections")
+    assert r.status_code == 200, r.text
+    assert collection in {c["name"] for c in r.json()["result"]["collections"]}
+
+
+def test_get_collection(client, collection):
+    r = client.get(f"/collections/{collection}")
+    assert r.status_code == 200, r.text
+    assert r.json()["result"]["config"]["params"]["vectors"]["size"] == VECTOR_SIZE
@@ -0,0 +1,66 @@
+"""Envio de upserts do QdrantStore (src/stores/qdrant_store.py), com um cliente falso."""
+import threading
+import time
+
+import numpy as np
+
+from src.stores.qdrant_store import QdrantStore
+
+
+class FakeClient:
+    """Registra cada upsert (nº de pontos, wait) e quantas requisições estavam em voo."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    def upsert(self, collection_name, points, wait):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            started_with = self.in_flight
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+            self.calls.append((list(points.ids), wait, started_with))
+
+
+def _store(**kwargs) -> QdrantStore:
+    store = QdrantStore("http://localhost:6333", "teste", 4, **kwargs)
+    store.client = FakeClient()
+    return store
+
+
+def _points(n: int):
+    vectors = np.random.rand(n, 4).astype(np.float32)
+    return [(f"doc:{i}", vectors[i], {"chunk_id": f"doc:{i}", "doc_id": "doc"}) for i in range(n)]
+
+
+def test_upsert_iter_sends_requests_concurrently():
+    store = _store(upsert_batch=8, parallelism=4)
+    n = 8 * 4 * 2 + 3
+    store.upsert_iter(_points(n))
+
+    calls = store.client.calls
+    assert store.client.max_in_flight > 1
+    assert sum(len(ids) for ids, _, _ in calls) == n
+    assert len({i for ids, _, _ in calls for i in ids}) == n
+    # só a última requisição aguarda a indexação
+    assert [wait for _, wait, _ in calls].count(True) == 1
+    assert calls[-1][1] is True
+
+
+def test_upsert_wait_sends_last_batch_alone():
+    store = _store(upsert_batch=8, parallelism=4)
+    ids, vectors, payloads = zip(*_points(8 * 5))
+    store.upsert(list(ids), np.asarray(vectors), list(payloads), wait=True)
+
+    calls = store.client.calls
+    assert len(calls) == 5
+    ids_last, wait_last, started_with = calls[-1]
+    assert wait_last is True and started_with == 1
+    assert ids_last == [store._ids_to_point_ids([f"doc:{i}"])[0] for i in range(32, 40)]
+    assert all(wait is False for _, wait, _ in calls[:-1])